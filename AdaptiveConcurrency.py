@@ -0,0 +1,126 @@
+import asyncio
+import time
+from collections import deque
+from ImportLogging import phase_logger
+
+log = phase_logger("requests")
+
+# Ergebnisarten eines Requests für die Regelung
+OK = "ok"
+LOCK = "lock"  # Lock-Konflikt auf dem Server
+OVERLOAD = "overload"  # HTTP 429/5xx, Timeout oder Verbindungsfehler
+
+class TokenBucket:
+    """
+    Begrenzt die Requests pro Sekunde auf rate (mit bis zu burst Requests am Stück).
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    async def take(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class AdaptiveLimiter:
+    """
+    Regelt die Anzahl gleichzeitig laufender Requests nach dem AIMD-Verfahren.
+
+    Jeder erfolgreiche Request erhöht das Limit additiv (um 1/Limit, also etwa um 1 je
+    Limit-Requests; bis zur ersten Überlast wie beim TCP-Slow-Start um 1 je Request).
+    Lock-Konflikte, HTTP-Überlast und Latenzen über dem Zielwert senken es multiplikativ,
+    höchstens einmal je beobachteter Latenz, damit ein Schwung gleichzeitiger Fehler das
+    Limit nicht mehrfach halbiert. Ohne target_latency gilt latency_tolerance mal die
+    kleinste beobachtete Latenz als Zielwert, getrennt je Request-Art (kind), da ein
+    Batch mit 25 Mutationen naturgemäß länger dauert als eine einzelne Mutation.
+    Ergebnisse ohne Aussage über die Serverlast (outcome=None) ändern das Limit nicht.
+
+    Optional begrenzt ein TokenBucket zusätzlich die Requests pro Sekunde (max_rps).
+    Mit adaptive=False bleibt das Limit fest auf maximum.
+    """
+
+    def __init__(self, maximum, initial=None, minimum=1, decrease=0.7, target_latency=None,
+                 latency_tolerance=3.0, max_rps=None, adaptive=True):
+        self.maximum = maximum
+        self.minimum = minimum
+        self.limit = float(min(initial or maximum, maximum)) if adaptive else float(maximum)
+        self.decrease = decrease
+        self.target_latency = target_latency
+        self.latency_tolerance = latency_tolerance
+        self.adaptive = adaptive
+        self.bucket = TokenBucket(max_rps) if max_rps else None
+        self.in_flight = 0
+        self.slow_start = True
+        self.min_latency = {}  # kind -> kleinste beobachtete Latenz
+        self.smoothed_latency = {}  # kind -> geglättete Latenz
+        self.last_decrease = 0.0
+        self.decreases = 0
+        self.peak_limit = self.limit
+        self._waiters = deque()
+
+    @property
+    def waiting(self):
+        return len(self._waiters)
+
+    async def acquire(self):
+        while self.in_flight >= int(self.limit):
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                raise
+        self.in_flight += 1
+        if self.bucket is not None:
+            await self.bucket.take()
+
+    def release(self, latency, outcome=OK, kind=None):
+        self.in_flight -= 1
+        if self.adaptive and outcome is not None:
+            self._adjust(latency, outcome, kind)
+        free = int(self.limit) - self.in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    def _adjust(self, latency, outcome, kind):
+        if outcome == OK:
+            min_latency = self.min_latency[kind] = min(self.min_latency.get(kind, latency), latency)
+            smoothed = self.smoothed_latency[kind] = 0.8 * self.smoothed_latency.get(kind, latency) + 0.2 * latency
+            target = self.target_latency or self.latency_tolerance * min_latency
+            if smoothed > target:
+                self._decrease("Latenz", smoothed)
+            elif self.slow_start:
+                self.limit = min(self.maximum, self.limit + 1)
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self.peak_limit = max(self.peak_limit, self.limit)
+        else:
+            self._decrease("Lock-Konflikt" if outcome == LOCK else "Überlast", self.smoothed_latency.get(kind, latency))
+
+    def _decrease(self, reason, latency):
+        now = time.monotonic()
+        if now - self.last_decrease < latency:
+            return
+        self.last_decrease = now
+        self.slow_start = False
+        self.decreases += 1
+        self.limit = max(self.minimum, self.limit * self.decrease)
+        log.debug("Parallelität reduziert (%s): %.1f", reason, self.limit)
+
+    def summary(self):
+        return (f"Parallelität: aktuell {int(self.limit)}, höchstens {int(self.peak_limit)} von {self.maximum}, "
+                f"{self.decreases} Reduzierungen")
@@ -0,0 +1,132 @@
+import asyncio
+import json
+import time
+import aiohttp
+from AdaptiveConcurrency import LOCK, OK, OVERLOAD, AdaptiveLimiter
+from ImportMetrics import metrics
+from GraphQLRequests import (build_batch_mutation, catalog_entry_input, catalog_entry_result, encode_request,
+	graphql_endpoint, relationship_input, retry_policy, split_batch_result, transport_settings)
+
+# Vorübergehende Transportfehler, die wiederholt werden
+TRANSIENT_ERRORS = (asyncio.TimeoutError, aiohttp.ClientConnectionError, aiohttp.ClientPayloadError)
+
+class AsyncGraphQLClient:
+	"""
+	Asynchroner GraphQL-Client für DataCat. Ein AdaptiveLimiter regelt die Anzahl
+	gleichzeitig laufender Requests anhand von Latenz, HTTP-Fehlern und Lock-Konflikten
+	(höchstens concurrency), alle Requests teilen sich einen Keep-Alive-Pool. Wiederholungen,
+	Neuanmeldung und Circuit Breaker übernimmt die gemeinsame RetryPolicy aus GraphQLRequests.
+
+	Verwendung:
+		async with AsyncGraphQLClient(token, concurrency=100) as client:
+			await client.create_catalog_entries(entries)
+	"""
+
+	def __init__(self, token, concurrency=100, limiter=None, policy=None):
+		self.token = token
+		self.limiter = limiter or AdaptiveLimiter(concurrency)
+		self.policy = policy or retry_policy()
+		self.concurrency = self.limiter.maximum
+		self.session = None
+
+	async def __aenter__(self):
+		settings = transport_settings()
+		connect_timeout, read_timeout = settings["timeout"]
+		self.session = aiohttp.ClientSession(
+			connector=aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.concurrency),
+			timeout=aiohttp.ClientTimeout(connect=connect_timeout, sock_read=read_timeout),
+		)
+		return self
+
+	async def __aexit__(self, exc_type, exc, tb):
+		await self.session.close()
+		self.session = None
+
+	async def graphql_request(self, query, variables=None, kind=None, retry_locks=True):
+		"""
+		kind: Art des Requests (z.B. Mutation und Batchgröße), für die der Limiter
+		eine eigene Referenzlatenz führt
+		retry_locks: Lock-Konflikte über die RetryPolicy wiederholen
+		"""
+		endpoint = graphql_endpoint()
+
+		async def send(token):
+			body, headers = encode_request(query, variables, token)
+			queued = time.monotonic()
+			await self.limiter.acquire()
+			outcome = None
+			start = time.monotonic()
+			try:
+				async with self.session.post(endpoint, data=body, headers=headers) as response:
+					if response.status == 429 or response.status >= 500:
+						outcome = OVERLOAD
+					raw = await response.read()
+					status = response.status
+					received = response.content_length or len(raw)
+				result = json.loads(raw) if status < 400 else None
+				metrics.record_request(query, status, time.monotonic() - start, len(body), received, result, start - queued)
+				if result is not None:
+					outcome = LOCK if "lock" in str(result.get("errors", "")).lower() else OK
+				return status, result
+			except TRANSIENT_ERRORS as e:
+				outcome = OVERLOAD
+				metrics.record_transport_error(query, e)
+				raise
+			finally:
+				self.limiter.release(time.monotonic() - start, outcome, kind)
+
+		self.token = self.policy.current_token(self.token)
+		return await self.policy.call_async(send, self.token, TRANSIENT_ERRORS, retry_locks)
+
+	async def create_catalog_entries(self, entries):
+		"""
+		Legt mehrere Katalogeinträge in einem Request an.
+		entries: Liste von (catalogEntryType, properties, tagIds)
+		Liefert je Eintrag den catalogEntry oder None bei Fehler (wie GraphQLRequests.create_catalog_entry),
+		ALREADY_EXISTS für Einträge, deren ID bereits vergeben ist.
+		"""
+		inputs = [catalog_entry_input(*entry) for entry in entries]
+		query, variables, aliases = build_batch_mutation("createCatalogEntry", "CreateCatalogEntryInput", inputs, "e")
+		result = await self.graphql_request(query, variables, ("createCatalogEntry", len(inputs)))
+		return [catalog_entry_result(alias, item) for alias, item in zip(aliases, split_batch_result(result, aliases))]
+
+	async def create_relationships(self, relationships):
+		"""
+		Legt mehrere Beziehungen in einem Request an.
+		relationships: Liste von (relationshipType, properties, fromId, toIds)
+		Liefert je Beziehung das Ergebnis im Format von GraphQLRequests.create_relationship.
+		"""
+		inputs = [relationship_input(*relationship) for relationship in relationships]
+		query, variables, aliases = build_batch_mutation("createRelationship", "CreateRelationshipInput", inputs, "r")
+		# Lock-Konflikte wiederholt der RelationshipScheduler gezielt je Beziehung
+		result = await self.graphql_request(query, variables, ("createRelationship", len(inputs)), retry_locks=False)
+		return split_batch_result(result, aliases)
+
+	async def add_tag(self, entryId, tagId):
+		"""
+		Async-Variante von GraphQLRequests.add_tag. Liefert None bei Fehler.
+		"""
+		query, variables, aliases = build_batch_mutation(
+			"addTag", "AddTagInput", [{"catalogEntryId": entryId, "tagId": tagId}], "t"
+		)
+		result = await self.graphql_request(query, variables, ("addTag", 1))
+		item = split_batch_result(result, aliases)[0]
+		if "errors" in item:
+			return None
+		return item["data"][aliases[0]]["catalogEntry"]
+
+	async def add_tags(self, entries):
+		"""
+		Versieht mehrere Katalogeinträge in einem Request mit einem Tag.
+		entries: Liste von (catalogEntryId, tagId). Liefert je Eintrag True bei Erfolg.
+		"""
+		inputs = [{"catalogEntryId": entryId, "tagId": tagId} for entryId, tagId in entries]
+		return await self._batch_mutation("addTag", "AddTagInput", inputs, "t")
+
+	async def _batch_mutation(self, field, input_type, inputs, alias_prefix):
+		"""
+		Sendet gleichartige Mutationen gebündelt in einem Request. Liefert je Eintrag True bei Erfolg.
+		"""
+		query, variables, aliases = build_batch_mutation(field, input_type, inputs, alias_prefix)
+		result = await self.graphql_request(query, variables, (field, len(inputs)))
+		return ["errors" not in item for item in split_batch_result(result, aliases)]
@@ -0,0 +1,117 @@
+import logging
+
+class CatalogState:
+    """
+    Vorhandener Stand eines Katalogs, gegen den ein neu geparster Plan abgeglichen wird
+    (z.B. alle Einträge mit dem Import-Tag auf dem Server).
+
+    entities: id -> (name, type_name, description)
+    edges: Menge von (relationship_type, from_id, to_id)
+    """
+
+    def __init__(self):
+        self.entities = {}
+        self.edges = set()
+
+    def add_entity(self, id, name, type_name, description):
+        self.entities[id] = (name, type_name, description)
+
+    def add_edge(self, rel_type, from_id, to_id):
+        self.edges.add((rel_type, from_id, to_id))
+
+class SyncPlan:
+    """
+    Delta zwischen CatalogState und neuem Plan. Der Import legt nur created an; Änderungen
+    und Löschungen am vorhandenen Bestand werden gemeldet, aber nicht übertragen.
+
+    created: neu anzulegende Entities (PlannedEntity, ohne Dictionary)
+    changed: geänderte Entities als (PlannedEntity, ID der vorhandenen Entity mit gleichem Typ und Namen)
+    stale: vorhandene Entities, auf die der Plan nicht mehr verweist, als (id, name, type_name)
+    stale_relationships: vorhandene Beziehungen, die im Plan fehlen, als (relationship_type, from_id, [to_ids])
+    existing_ids: IDs der bereits vorhandenen Entities des Plans außer dem Dictionary
+    """
+
+    def __init__(self, created, changed, stale, stale_relationships, existing_ids):
+        self.created = created
+        self.changed = changed
+        self.stale = stale
+        self.stale_relationships = stale_relationships
+        self.existing_ids = existing_ids
+
+    def summary(self):
+        stale_targets = sum(len(to_ids) for _, _, to_ids in self.stale_relationships)
+        return (f"Abgleich: {len(self.created)} Entities anlegen; nicht übertragen: {len(self.changed)} geändert, "
+                f"{len(self.stale)} nicht mehr enthalten, {stale_targets} Relationen nicht mehr enthalten")
+
+    def details(self):
+        """
+        Zeilen für das Protokoll: je geänderter und nicht mehr enthaltener Entity und Beziehung.
+        """
+        for task, existing_id in self.changed:
+            yield f"Geändert: {task.type_name} '{task.name}' (vorhanden {existing_id}, neu {task.id})"
+        for id, name, type_name in self.stale:
+            yield f"Nicht mehr enthalten: {type_name} '{name}' ({id})"
+        for rel_type, from_id, to_ids in self.stale_relationships:
+            yield f"Relation nicht mehr enthalten: {getattr(rel_type, 'value', rel_type)} {from_id} -> {', '.join(to_ids)}"
+
+def plan_edges(relationship_tasks):
+    for rel_type, _, from_id, to_ids in relationship_tasks:
+        for to_id in to_ids:
+            yield rel_type, from_id, to_id
+
+def diff_plan(state, dictAttrs, tasks, relationship_tasks, dictionary_rel_type):
+    """
+    Gleicht den geparsten Plan mit state ab. Entities mit unverändertem Lookup-Key
+    (name, typ, description) tragen bereits die vorhandene ID (entity_lookup wurde aus
+    state befüllt) und stehen nicht in tasks.
+
+    Eine neue Entity, deren (typ, name) genau einer nicht mehr verwendeten vorhandenen
+    Entity entspricht, gilt als geändert. Vorhandene Entities, auf die der Plan nicht mehr
+    verweist, und Beziehungen zwischen verbleibenden Entities, die im Plan fehlen, gelten
+    als nicht mehr enthalten. Beides wird nur gemeldet.
+
+    Liefert den SyncPlan.
+    """
+    referenced = {dictAttrs.id}
+    referenced.update(task.id for task in tasks)
+    for rel_type, from_id, to_id in plan_edges(relationship_tasks):
+        referenced.add(from_id)
+        referenced.add(to_id)
+    unreferenced = {id: entity for id, entity in state.entities.items() if id not in referenced}
+
+    # Umbenennungen sind nicht erkennbar, eindeutige Paare über (typ, name) schon
+    unreferenced_by_name = {}
+    for id, (name, type_name, _) in unreferenced.items():
+        unreferenced_by_name.setdefault((type_name, name), []).append(id)
+    created_by_name = {}
+    for task in [dictAttrs, *tasks]:
+        if task.is_new:
+            created_by_name.setdefault((task.type_name, task.name), []).append(task)
+
+    changed = []
+    changed_ids = set()
+    for name_key, candidates in created_by_name.items():
+        existing = unreferenced_by_name.get(name_key, ())
+        if len(candidates) == 1 and len(existing) == 1:
+            changed.append((candidates[0], existing[0]))
+            changed_ids.add(existing[0])
+    stale = [(id, name, type_name) for id, (name, type_name, _) in unreferenced.items() if id not in changed_ids]
+
+    created = [task for task in tasks if task.is_new]
+    entity_ids = referenced - {dictAttrs.id}
+
+    # Dictionary-Beziehungen legt der Import für jede Entity an, sie zählen zum Plan
+    new_edges = set(plan_edges(relationship_tasks))
+    new_edges.update((dictionary_rel_type, id, dictAttrs.id) for id in entity_ids)
+    stale_edges = {}
+    for rel_type, from_id, to_id in state.edges:
+        # Beziehungen nicht mehr verwendeter Entities gehören zu deren Meldung
+        if (rel_type, from_id, to_id) in new_edges or from_id in unreferenced or to_id in unreferenced:
+            continue
+        stale_edges.setdefault((rel_type, from_id), []).append(to_id)
+    stale_relationships = [(rel_type, from_id, to_ids) for (rel_type, from_id), to_ids in stale_edges.items()]
+
+    existing_ids = [id for id in entity_ids if id in state.entities]
+    sync_plan = SyncPlan(created, changed, stale, stale_relationships, existing_ids)
+    logging.info(sync_plan.summary())
+    return sync_plan
@@ -0,0 +1,118 @@
+import asyncio
+import contextvars
+import logging
+import time
+from AsyncGraphQLRequests import AsyncGraphQLClient
+from CatalogSync import CatalogState
+from GraphQLRequests import load_config, login
+from ImportLogging import log_counts
+from ImportMetrics import ImportMetrics, use_metrics
+import main
+
+def run_in_thread(loop, func, *args):
+    # Threads übernehmen ImportState und ImportMetrics des aufrufenden Imports
+    return loop.run_in_executor(None, contextvars.copy_context().run, func, *args)
+
+class DataCatImporter:
+    """
+    Einbettbarer Importer für langlebige Prozesse (z.B. einen Worker an einer Job-Queue).
+    Erzeugen und Importieren des Moduls haben keine Seiteneffekte; Konfiguration (.env),
+    Anmeldung und HTTP-Verbindungspool entstehen beim ersten Import und bleiben für alle
+    weiteren erhalten. Jeder Import erhält einen eigenen ImportState (Lookup-Tabellen,
+    Vorabgleich, ID-Tag), sodass nichts zwischen Importen verbleibt; die Kennzahlen
+    (metrics) gehören der Instanz. Beides gilt nur im Kontext des Imports, mehrere
+    Instanzen können daher gleichzeitig importieren. Die Importe einer Instanz laufen
+    nacheinander.
+
+    Nicht angegebene Einstellungen kommen wie bei der Kommandozeile aus der Umgebung.
+    Das Logging richtet die einbettende Anwendung ein.
+
+    Verwendung:
+        async with DataCatImporter() as importer:
+            for job in jobs:
+                summary = await importer.import_catalogue(job.file, job.tag_id, job.tag_name)
+    """
+
+    def __init__(self, batch_size=None, max_to_ids=None, link_batch_size=None, adaptive=True):
+        self.batch_size = batch_size
+        self.max_to_ids = max_to_ids
+        self.link_batch_size = link_batch_size
+        self.adaptive = adaptive
+        self.client = None
+        self.metrics = ImportMetrics()
+        self._lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def start(self):
+        """
+        Lädt die Konfiguration, meldet sich an und öffnet den Verbindungspool, falls noch
+        nicht geschehen (sonst beim ersten Import). Liefert den Client.
+        """
+        if self.client is not None:
+            return self.client
+        load_config()
+        batch_size, max_to_ids, link_batch_size = main.batch_settings_from_env()
+        self.batch_size = self.batch_size or batch_size
+        self.max_to_ids = self.max_to_ids or max_to_ids
+        self.link_batch_size = self.link_batch_size or link_batch_size
+        token = await run_in_thread(asyncio.get_running_loop(), login)
+        client = AsyncGraphQLClient(token, limiter=main.limiter_from_env(self.adaptive))
+        await client.__aenter__()
+        self.client = client
+        return client
+
+    @property
+    def token(self):
+        """
+        Aktuelles Token (nach einer Neuanmeldung das erneuerte).
+        """
+        return self.client.policy.current_token(self.client.token) if self.client is not None else None
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.__aexit__(None, None, None)
+            self.client = None
+
+    async def import_catalogue(self, file_path, tag_id, tag_name=None, deterministic_ids=False, prefetch=False,
+                               sync=False, parse_cache=None, prefetch_page_size=1000):
+        """
+        Importiert einen FeatureCatalogue wie der Batch-Modus der Kommandozeile (mit den
+        Optionen --deterministic-ids, --prefetch, --sync und --parse-cache).
+        Liefert die Kennzahlen dieses Imports (ImportMetrics.summary).
+        """
+        async with self._lock:
+            client = await self.start()
+            loop = asyncio.get_running_loop()
+            self.metrics.reset()
+            import_state = main.ImportState(tag_id if deterministic_ids else None, self.max_to_ids,
+                                            self.link_batch_size)
+            with main.use_state(import_state), use_metrics(self.metrics):
+                start = time.time()
+                await run_in_thread(loop, main.ensure_tag, self.token, tag_id, tag_name or tag_id)
+
+                sync_state = CatalogState() if sync else None
+                if prefetch or sync:
+                    start_prefetch = time.time()
+                    await run_in_thread(loop, main.prefetch_existing_entries, self.token, tag_id, prefetch_page_size,
+                                        sync_state)
+                    self.metrics.record_phase("prefetch", time.time() - start_prefetch)
+                # Parsen im Thread, damit der Event-Loop anderer Aufgaben des Prozesses weiterläuft
+                dictAttrs, tasks, relationship_tasks, sync_plan = await run_in_thread(
+                    loop, main.prepare_batch_import, file_path, sync_state, parse_cache)
+
+                sampler = asyncio.ensure_future(self.metrics.sample_periodically(main.limiter_probes(client.limiter)))
+                try:
+                    await main.upload_catalogue(client, tag_id, dictAttrs, tasks, relationship_tasks, self.batch_size,
+                                                sync_plan.existing_ids if sync_plan is not None else ())
+                finally:
+                    sampler.cancel()
+                log_counts.log_summary()
+                main.log_avoided_calls()
+                self.metrics.record_phase("total", time.time() - start)
+            logging.info(f"Import von {file_path} abgeschlossen nach {time.time() - start:.2f} Sekunden")
+            return self.metrics.summary()
@@ -1,26 +1,155 @@
 import os
 import re
+import gzip
+import json
+import threading
+import time
 import requests
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
-import logging
+from ImportLogging import phase_logger
+from ImportMetrics import metrics
+from RetryPolicy import RequestFailed, RetryPolicy
 
-load_dotenv()
+log = phase_logger("requests")
 
-GRAPHQL_ENDPOINT = os.getenv("DATACAT_URL") + "/graphql"
-USERNAME = os.getenv("DATACAT_USERNAME")
-PASSWORD = os.getenv("DATACAT_PASSWORD")
+GZIP_MIN_SIZE = 1024  # Kleine Bodies lohnen die Kompression nicht
 
-def graphql_request(query, variables=None, token=None):
+# Transport-Einstellungen (Timeouts in Sekunden) und gemeinsame Wiederholungsstrategie aller
+# Requests (siehe RetryPolicy); beide werden erst beim ersten Gebrauch aus .env bzw. der
+# Umgebung gelesen (load_config), der Import des Moduls hat keine Seiteneffekte
+_transport = {}
+_retry_policy = None
+_session = None
+_session_lock = threading.Lock()
+_config_lock = threading.Lock()
+
+# Vorübergehende Transportfehler, die wiederholt werden
+TRANSIENT_ERRORS = (requests.ConnectionError, requests.Timeout)
+
+# Fehlermeldungen, mit denen DataCat eine bereits vergebene ID ablehnt. Die IDs vergibt der
+# Importer selbst, ein solcher Eintrag wurde also schon angelegt (früherer Lauf oder
+# wiederholter Request, dessen erste Antwort verloren ging).
+EXISTS_MESSAGES = ("already exists", "duplicate")
+ALREADY_EXISTS = "ALREADY_EXISTS"
+
+def load_config():
+	"""
+	Lädt .env und liest die Transport- und Wiederholungseinstellungen aus der Umgebung.
+	Läuft nur einmal; alle Funktionen, die die Einstellungen benötigen, rufen es auf.
+	"""
+	global _retry_policy
+	if _retry_policy is not None:
+		return
+	with _config_lock:
+		if _retry_policy is not None:
+			return
+		load_dotenv()
+		_transport.update({
+			# Ein Keep-Alive-Platz je möglichem gleichzeitigem Request (wie der Limiter)
+			"pool_size": max(int(os.getenv("DATACAT_CONCURRENCY", "100")), 1),
+			"timeout": (float(os.getenv("DATACAT_CONNECT_TIMEOUT", "5")), float(os.getenv("DATACAT_READ_TIMEOUT", "60"))),
+			"gzip": os.getenv("DATACAT_GZIP", "false").lower() in ("1", "true", "yes"),
+		})
+		_retry_policy = RetryPolicy(
+			max_retries=max(int(os.getenv("DATACAT_MAX_RETRIES", "5")), 1),
+			base_delay=float(os.getenv("DATACAT_RETRY_BASE_DELAY", "0.5")),
+			max_delay=float(os.getenv("DATACAT_RETRY_MAX_DELAY", "30")),
+			breaker_threshold=max(int(os.getenv("DATACAT_BREAKER_THRESHOLD", "10")), 1),
+			breaker_cooldown=float(os.getenv("DATACAT_BREAKER_COOLDOWN", "30")),
+			relogin=lambda: login(),
+		)
+
+def get_session():
+	"""
+	Liefert die gemeinsame Session mit einem Verbindungspool in Größe von DATACAT_CONCURRENCY.
+	"""
+	global _session
+	load_config()
+	if _session is None:
+		with _session_lock:
+			if _session is None:
+				session = requests.Session()
+				adapter = HTTPAdapter(
+					pool_connections=1,
+					pool_maxsize=_transport["pool_size"],
+					pool_block=True,
+					max_retries=0
+				)
+				session.mount("http://", adapter)
+				session.mount("https://", adapter)
+				session.headers.update({
+					"Content-Type": "application/json",
+					"Accept-Encoding": "gzip",
+					"Connection": "keep-alive",
+				})
+				_session = session
+	return _session
+
+def graphql_endpoint():
+	"""
+	Liefert den GraphQL-Endpunkt. DATACAT_URL wird erst beim Senden gelesen, damit das
+	Modul auch ohne Konfiguration importiert werden kann (z.B. in Benchmarks).
+	"""
+	load_config()
+	url = os.getenv("DATACAT_URL")
+	if not url:
+		raise RuntimeError("DATACAT_URL ist nicht gesetzt")
+	return url.rstrip("/") + "/graphql"
+
+def retry_policy():
+	"""
+	Liefert die gemeinsame RetryPolicy (auch für den asynchronen Client).
+	"""
+	load_config()
+	return _retry_policy
+
+def transport_settings():
+	"""
+	Liefert eine Kopie der aktuellen Transport-Einstellungen (pool_size, timeout, gzip).
+	"""
+	load_config()
+	return dict(_transport)
+
+def encode_request(query, variables=None, token=None):
+	"""
+	Serialisiert einen GraphQL-Request und liefert (body, headers).
+	Der Body wird bei aktivierter Kompression ab GZIP_MIN_SIZE gzip-komprimiert.
+	"""
+	load_config()
 	headers = {"Content-Type": "application/json"}
 	if token:
 		headers["Authorization"] = f"Bearer {token}"
-	response = requests.post(
-		GRAPHQL_ENDPOINT,
-		json={"query": query, "variables": variables},
-		headers=headers
-	)
-	response.raise_for_status()
-	return response.json()
+	body = json.dumps({"query": query, "variables": variables}).encode("utf-8")
+	if _transport["gzip"] and len(body) >= GZIP_MIN_SIZE:
+		body = gzip.compress(body)
+		headers["Content-Encoding"] = "gzip"
+	return body, headers
+
+def graphql_request(query, variables=None, token=None):
+	"""
+	Sendet einen GraphQL-Request über die RetryPolicy (Backoff, Neuanmeldung, Circuit Breaker).
+	Wirft RequestFailed, wenn der Request endgültig fehlschlägt.
+	"""
+	def send(token):
+		body, headers = encode_request(query, variables, token)
+		start = time.monotonic()
+		try:
+			response = get_session().post(
+				graphql_endpoint(),
+				data=body,
+				headers=headers,
+				timeout=_transport["timeout"]
+			)
+		except TRANSIENT_ERRORS as e:
+			metrics.record_transport_error(query, e)
+			raise
+		result = response.json() if response.status_code < 400 else None
+		received = int(response.headers.get("Content-Length") or len(response.content))
+		metrics.record_request(query, response.status_code, time.monotonic() - start, len(body), received, result)
+		return response.status_code, result
+
+	return retry_policy().call(send, token, TRANSIENT_ERRORS)
 
 def login():
 	query = """
@@ -28,7 +157,8 @@ def login():
 		login(input: {username: $username, password: $password})
 	}
 	"""
-	variables = {"username": USERNAME, "password": PASSWORD}
+	load_config()
+	variables = {"username": os.getenv("DATACAT_USERNAME"), "password": os.getenv("DATACAT_PASSWORD")}
 	result = graphql_request(query, variables)
 	return result["data"]["login"]
 
@@ -40,15 +170,83 @@ def create_catalog_entry(token, catalogEntryType, properties, tagId):
 		}
 	}
 	"""
-	variables = {"input": {"catalogEntryType": catalogEntryType, "properties": properties, "tags": tagId}}
+	variables = {"input": catalog_entry_input(catalogEntryType, properties, tagId)}
 	result = graphql_request(query, variables, token)
 	if "errors" in result:
-		# logging.error(f"Fehler beim Erstellen des Katalogeintrags: {result}")
+		# log.error(f"Fehler beim Erstellen des Katalogeintrags: {result}")
 		return None
 	else:
 		return result["data"]["createCatalogEntry"]["catalogEntry"]
 	
 
+def catalog_entry_input(catalogEntryType, properties, tagIds):
+	"""
+	Input einer createCatalogEntry-Mutation (einzeln oder gebündelt).
+	"""
+	return {"catalogEntryType": catalogEntryType, "properties": properties, "tags": tagIds}
+
+def relationship_input(relationshipType, properties, fromId, toIds):
+	"""
+	Input einer createRelationship-Mutation; properties entfallen, wenn None.
+	"""
+	if properties is not None:
+		return {"relationshipType": relationshipType, "properties": properties, "fromId": fromId, "toIds": toIds}
+	return {"relationshipType": relationshipType, "fromId": fromId, "toIds": toIds}
+
+def build_batch_mutation(field, input_type, inputs, alias_prefix):
+	"""
+	Baut ein GraphQL-Dokument, das mehrere Mutationen desselben Typs über Aliase
+	bündelt (e1: createCatalogEntry(input: $e1) ..., e2: ...).
+	"""
+	aliases = [f"{alias_prefix}{n}" for n in range(1, len(inputs) + 1)]
+	definitions = ", ".join(f"${alias}: {input_type}!" for alias in aliases)
+	fields = "\n".join(
+		f"\t\t{alias}: {field}(input: ${alias}) {{ catalogEntry {{ __typename }} }}" for alias in aliases
+	)
+	query = f"mutation Batch({definitions}) {{\n{fields}\n\t}}"
+	variables = dict(zip(aliases, inputs))
+	return query, variables, aliases
+
+def split_batch_result(result, aliases):
+	"""
+	Ordnet Daten und Fehler eines Batch-Ergebnisses den einzelnen Aliasen zu.
+	Liefert je Alias ein Ergebnis in der Form einer Einzel-Mutation ({"data": ...} bzw. {"errors": [...]}).
+	Fehler ohne Alias-Pfad betreffen das ganze Dokument und werden allen Einträgen ohne Daten zugeordnet.
+	"""
+	data = result.get("data") or {}
+	errors_by_alias = {alias: [] for alias in aliases}
+	global_errors = []
+	for error in result.get("errors") or []:
+		path = error.get("path") or []
+		if path and path[0] in errors_by_alias:
+			errors_by_alias[path[0]].append(error)
+		else:
+			global_errors.append(error)
+
+	split = []
+	for alias in aliases:
+		item_data = data.get(alias)
+		item_errors = errors_by_alias[alias]
+		if item_data is None and not item_errors:
+			item_errors = global_errors
+		if item_errors:
+			split.append({"data": {alias: item_data}, "errors": item_errors})
+		else:
+			split.append({"data": {alias: item_data}})
+	return split
+
+def catalog_entry_result(alias, item):
+	"""
+	Ergebnis eines Eintrags einer gebündelten createCatalogEntry-Mutation: catalogEntry,
+	ALREADY_EXISTS oder None bei Fehler.
+	"""
+	if "errors" not in item:
+		return item["data"][alias]["catalogEntry"]
+	messages = [str(error.get("message", "")).lower() for error in item["errors"]]
+	if messages and all(any(text in message for text in EXISTS_MESSAGES) for message in messages):
+		return ALREADY_EXISTS
+	return None
+
 def create_relationship(token, relationshipType, properties, fromId, toIds):
     
 	query = """
@@ -58,10 +256,7 @@ def create_relationship(token, relationshipType, properties, fromId, toIds):
 		}
 	}
 	"""
-	if properties is not None:
-		variables = {"input": {"relationshipType": relationshipType, "properties": properties, "fromId": fromId, "toIds": toIds}}
-	else:
-		variables = {"input": {"relationshipType": relationshipType, "fromId": fromId, "toIds": toIds}}
+	variables = {"input": relationship_input(relationshipType, properties, fromId, toIds)}
 
 	result = graphql_request(query, variables, token)
 	return result
@@ -90,11 +285,48 @@ def get_tag(token, tagId):
 	variables = {"id": tagId}
 	result = graphql_request(query, variables, token)
 	if "errors" in result:
-		logging.error(f"Fehler beim Abrufen des Tags: {result}")
+		log.error(f"Fehler beim Abrufen des Tags: {result}")
 		return None
 	else:
 		return result["data"]["getTag"]
 
+FIND_TAGGED_ENTRIES_QUERY = """
+	query FindTaggedEntries($input: SearchInput!, $pageSize: Int, $pageNumber: Int) {
+		search(input: $input, pageSize: $pageSize, pageNumber: $pageNumber) {
+			nodes {
+				id
+				recordType
+				name
+				description
+				dictionary { id }
+				... on XtdSubject {
+					properties { id }
+					connectedSubjects { targetSubjects { id } }
+				}
+				... on XtdProperty { possibleValues { id } }
+				... on XtdValueList { values { orderedValue { id } } }
+			}
+			pageInfo { hasNext }
+			totalElements
+		}
+	}
+	"""
+
+def find_tagged_entries(token, tagId, page_size=1000, page_number=0):
+	"""
+	Liefert eine Seite aller Katalogeinträge mit dem Tag tagId inklusive ihrer ausgehenden
+	Beziehungen. Rückgabe: (nodes, has_next, total_elements)
+	Wirft RequestFailed, wenn der Server Fehler meldet; eine leere Seite hieße sonst
+	"keine weiteren Einträge".
+	"""
+	variables = {"input": {"tagged": [tagId]}, "pageSize": page_size, "pageNumber": page_number}
+	result = graphql_request(FIND_TAGGED_ENTRIES_QUERY, variables, token)
+	if "errors" in result:
+		log.error(f"Fehler beim Abrufen der Einträge mit Tag {tagId}: {result['errors']}")
+		raise RequestFailed(f"Seite {page_number} der Einträge mit Tag {tagId}: {result['errors']}")
+	page = result["data"]["search"]
+	return page["nodes"], page["pageInfo"]["hasNext"], page["totalElements"]
+
 def add_tag(token, entryId, tagId):
 	query = """
 	mutation AddTag($input: AddTagInput!) {
@@ -106,7 +338,7 @@ def add_tag(token, entryId, tagId):
 	variables = {"input": {"catalogEntryId": entryId, "tagId": tagId}}
 	result = graphql_request(query, variables, token)
 	if "errors" in result:
-		logging.error(f"Fehler beim Hinzufügen des Tags: {result}")
+		log.error(f"Fehler beim Hinzufügen des Tags: {result}")
 		return None
 	else:
 		return result["data"]["addTag"]["catalogEntry"]
\ No newline at end of file
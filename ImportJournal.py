@@ -0,0 +1,83 @@
+import logging
+import os
+import sqlite3
+
+class ImportJournal:
+    """
+    Dauerhaftes Protokoll eines Imports (SQLite). Festgehalten werden alle bestätigt
+    angelegten Entities (mit ihrem Lookup-Key), Tag-Zuweisungen und Beziehungen. Nach
+    einem Abbruch lädt --resume das Protokoll in entity_lookup und relation_lookup,
+    so dass nur noch die offene Arbeit gesendet wird.
+
+    Die record_*-Methoden schreiben nur in die laufende Transaktion. Der Aufrufer schreibt
+    sie mit commit() fest, sobald ein Request bestätigt ist. So sendet --resume nach einem
+    Abbruch keine bereits bestätigte Arbeit erneut.
+    """
+
+    def __init__(self, path, resume=False):
+        if not resume:
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS entities (
+                id TEXT PRIMARY KEY, name TEXT, entity_type TEXT, description TEXT
+            );
+            CREATE TABLE IF NOT EXISTS tags (entry_id TEXT, tag_id TEXT, PRIMARY KEY (entry_id, tag_id));
+            CREATE TABLE IF NOT EXISTS relationships (
+                rel_type TEXT, from_id TEXT, to_id TEXT, PRIMARY KEY (rel_type, from_id, to_id)
+            );
+        """)
+        self.connection.commit()
+
+    def get_meta(self, key):
+        row = self.connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        self.connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+        self.connection.commit()
+
+    def record_entity(self, lookup_key, entity_id):
+        name, entity_type, description = lookup_key
+        self.connection.execute(
+            "INSERT OR REPLACE INTO entities (id, name, entity_type, description) VALUES (?, ?, ?, ?)",
+            (entity_id, name, entity_type, description)
+        )
+
+    def record_tag(self, entry_id, tag_id):
+        self.connection.execute("INSERT OR IGNORE INTO tags (entry_id, tag_id) VALUES (?, ?)", (entry_id, tag_id))
+
+    def record_relationships(self, rel_type, from_id, to_ids):
+        self.connection.executemany(
+            "INSERT OR IGNORE INTO relationships (rel_type, from_id, to_id) VALUES (?, ?, ?)",
+            [(getattr(rel_type, "value", rel_type), from_id, to_id) for to_id in to_ids]
+        )
+
+    def commit(self):
+        self.connection.commit()
+
+    def load_entities(self):
+        """
+        Liefert {(name, typ, description): id} aller bestätigten Entities.
+        """
+        rows = self.connection.execute("SELECT name, entity_type, description, id FROM entities")
+        return {(name, entity_type, description): entity_id for name, entity_type, description, entity_id in rows}
+
+    def load_relationships(self, rel_types):
+        """
+        Liefert {(relationship_type, from_id, to_id)} aller bestätigten Beziehungen.
+        rel_types: Abbildung des gespeicherten Typnamens auf den RelType.
+        """
+        rows = self.connection.execute("SELECT rel_type, from_id, to_id FROM relationships")
+        return {(rel_types[rel_type], from_id, to_id) for rel_type, from_id, to_id in rows}
+
+    def close(self):
+        self.commit()
+        self.connection.close()
+        logging.info(f"Import-Journal geschrieben: {self.path}")
@@ -0,0 +1,137 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+from collections import Counter
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(message)s"
+
+# Phasen mit eigenem Logger (import.<phase>), deren Level sich über DATACAT_LOG_LEVELS einstellen lässt
+PHASES = ("parse", "entities", "relationships", "sync", "requests")
+
+# Höchstzahl ausgegebener Schlüssel je Kategorie in der Zusammenfassung
+SUMMARY_LIMIT = 20
+
+# Mit setup_logging eingerichtete Logdatei und Listener (None = Logging gehört der Anwendung)
+active_log_file = None
+_listener = None
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Legt den Record unverändert in die Queue. Die Nachricht wird erst im Listener-Thread
+    formatiert, der aufrufende Worker zahlt nur für das Einreihen.
+    """
+
+    def prepare(self, record):
+        return record
+
+class LogAggregator:
+    """
+    Zählt wiederkehrende Meldungen (z.B. unbekannte Schema-Typen je Tag, Wiederholungen je
+    Fehlerklasse), statt jede einzeln zu protokollieren. log_summary gibt die Zählerstände
+    am Ende des Laufs aus. Threadsicher.
+    """
+
+    def __init__(self):
+        self.counts = Counter()  # (Kategorie, Schlüssel) -> Anzahl
+        self._lock = threading.Lock()
+
+    def count(self, category, key=""):
+        with self._lock:
+            self.counts[(category, key)] += 1
+
+    def drain(self):
+        """
+        Liefert die Zählerstände und setzt sie zurück (z.B. zur Übergabe aus einem Parse-Prozess).
+        """
+        with self._lock:
+            counts, self.counts = self.counts, Counter()
+        return counts
+
+    def merge(self, counts):
+        with self._lock:
+            self.counts.update(counts)
+
+    def log_summary(self):
+        by_category = {}
+        for (category, key), count in self.drain().most_common():
+            by_category.setdefault(category, []).append((key, count))
+        for category, entries in by_category.items():
+            total = sum(count for _, count in entries)
+            logging.info(f"{category}: {total}x")
+            for key, count in entries[:SUMMARY_LIMIT]:
+                if key != "":
+                    logging.info(f"  {count:8d}x  {key}")
+            if len(entries) > SUMMARY_LIMIT:
+                logging.info(f"  ... {len(entries) - SUMMARY_LIMIT} weitere")
+
+log_counts = LogAggregator()
+
+def phase_logger(phase):
+    return logging.getLogger(f"import.{phase}")
+
+def parse_levels(text):
+    """
+    Liest Phasen-Level der Form "parse=WARNING,relationships=ERROR".
+    """
+    levels = {}
+    for item in filter(None, (part.strip() for part in (text or "").split(","))):
+        phase, _, level = item.partition("=")
+        if phase.strip() not in PHASES:
+            raise ValueError(f"Unbekannte Phase in DATACAT_LOG_LEVELS: {phase.strip()}")
+        levels[phase.strip()] = level.strip().upper()
+    return levels
+
+def setup_logging(log_file="logfile.txt", queued=True):
+    """
+    Richtet das Logging ein: Level aus DATACAT_LOG_LEVEL (Standard INFO) und je Phase aus
+    DATACAT_LOG_LEVELS. Mit queued schreiben alle Threads nur in eine Queue; ein
+    QueueListener-Thread formatiert die Meldungen und gibt sie auf der Konsole und in
+    log_file aus, sodass langsame Ausgaben die Worker nicht bremsen. Ohne queued (z.B. in
+    Parse-Prozessen, deren Listener beim Beenden nicht mehr geleert würde) werden die
+    Handler direkt angehängt.
+    """
+    global active_log_file, _listener
+    active_log_file = log_file
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = [logging.StreamHandler(), logging.FileHandler(log_file, encoding="utf-8")]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.setLevel(os.getenv("DATACAT_LOG_LEVEL", "INFO").upper())
+    for phase, level in parse_levels(os.getenv("DATACAT_LOG_LEVELS")).items():
+        phase_logger(phase).setLevel(level)
+
+    if not queued:
+        for handler in handlers:
+            root.addHandler(handler)
+        return None
+    log_queue = queue.SimpleQueue()
+    root.addHandler(_DeferredQueueHandler(log_queue))
+    _listener = logging.handlers.QueueListener(log_queue, *handlers)
+    _listener.start()
+    # Beim Beenden noch eingereihte Meldungen ausgeben
+    atexit.register(_listener.stop)
+    return _listener
+
+def worker_logging(parent_log_file):
+    """
+    Logging in einem Worker-Prozess. Geforkte Prozesse erben den Queue-Handler, aber nicht
+    den Listener-Thread; sie schreiben stattdessen direkt über dessen Handler. Neu
+    gestartete Prozesse (spawn) richten das Logging des Elternprozesses ohne Queue ein.
+    parent_log_file: active_log_file des Elternprozesses (None, wenn die Anwendung das Logging einrichtet)
+    """
+    root = logging.getLogger()
+    if parent_log_file is not None and not root.handlers:
+        setup_logging(parent_log_file, queued=False)
+        return
+    for handler in root.handlers[:]:
+        if isinstance(handler, _DeferredQueueHandler):
+            root.removeHandler(handler)
+            for target in (_listener.handlers if _listener is not None else ()):
+                root.addHandler(target)
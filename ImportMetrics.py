@@ -0,0 +1,361 @@
+import asyncio
+import contextvars
+import cProfile
+import io
+import json
+import logging
+import pstats
+import re
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from functools import lru_cache
+
+# Obergrenzen der Latenz-Buckets in Sekunden
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, float("inf"))
+
+OPERATION = re.compile(r"\{\s*(?:\w+\s*:\s*)?(\w+)")
+
+@lru_cache(maxsize=256)
+def describe_request(query):
+    """
+    Liefert (Operation, Anzahl der Mutationen) eines GraphQL-Dokuments, z.B.
+    ("createRelationship", 25) für einen Batch. Gleiche Batchgrößen erzeugen
+    identische Dokumente, daher der Cache.
+    """
+    match = OPERATION.search(query)
+    operation = match.group(1) if match else "unknown"
+    return operation, max(1, query.count(f" {operation}("))
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def observe(self, value):
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, fraction):
+        """
+        Schätzt ein Quantil durch lineare Interpolation innerhalb des Buckets,
+        begrenzt auf den kleinsten und größten beobachteten Wert.
+        """
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        lower = 0.0
+        for bound, count in zip(self.buckets, self.counts):
+            if seen + count >= rank and count:
+                lower, bound = max(lower, self.min), min(bound, self.max)
+                return lower + (bound - lower) * (rank - seen) / count
+            seen += count
+            lower = bound
+        return self.max
+
+class Gauge:
+    """
+    Stichproben eines Zustands (z.B. Warteschlangenlänge): letzter, größter und mittlerer Wert.
+    """
+
+    def __init__(self):
+        self.last = 0.0
+        self.max = 0.0
+        self.sum = 0.0
+        self.count = 0
+
+    def sample(self, value):
+        self.last = value
+        self.max = max(self.max, value)
+        self.sum += value
+        self.count += 1
+
+    @property
+    def avg(self):
+        return self.sum / self.count if self.count else 0.0
+
+class ImportMetrics:
+    """
+    Sammelt Kennzahlen eines Imports: Zähler, Latenz-Histogramme und Stichproben,
+    jeweils mit Labels (z.B. operation="createRelationship"), sowie die Dauer der Phasen.
+    Am Ende des Laufs als JSON-Zusammenfassung und im Prometheus-Textformat ausgeben.
+    """
+
+    def __init__(self):
+        self.counters = {}  # (name, labels) -> Wert
+        self.histograms = {}  # (name, labels) -> Histogram
+        self.gauges = {}  # (name, labels) -> Gauge
+        self.phases = {}  # Phase -> Sekunden
+        self.profiles = {}  # Abschnitt -> Ergebnisse von cProfile/tracemalloc
+        self._lock = threading.Lock()
+
+    def reset(self):
+        """
+        Verwirft alle Kennzahlen, z.B. vor dem nächsten Import in einem langlebigen Prozess.
+        """
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.gauges.clear()
+            self.phases.clear()
+            self.profiles.clear()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def sample(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            gauge = self.gauges.get(key)
+            if gauge is None:
+                gauge = self.gauges[key] = Gauge()
+            gauge.sample(value)
+
+    def record_phase(self, phase, seconds):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def record_request(self, query, status, latency, sent_bytes, received_bytes, result=None, wait=None):
+        """
+        Erfasst einen einzelnen HTTP-Versuch eines GraphQL-Requests.
+        wait: Wartezeit auf einen freien Platz im Limiter (clientseitige Warteschlange)
+        """
+        operation, count = describe_request(query)
+        self.inc("requests_total", operation=operation, status=str(status))
+        self.inc("operations_total", count, operation=operation)
+        self.inc("bytes_sent_total", sent_bytes, operation=operation)
+        self.inc("bytes_received_total", received_bytes, operation=operation)
+        self.observe("request_duration_seconds", latency, operation=operation)
+        if wait is not None:
+            self.observe("slot_wait_seconds", wait, operation=operation)
+        if result is not None:
+            errors = result.get("errors") or ()
+            if errors:
+                locks = sum(1 for error in errors if "lock" in str(error.get("message", "")).lower())
+                if locks:
+                    self.inc("lock_conflicts_total", locks, operation=operation)
+                if len(errors) > locks:
+                    self.inc("graphql_errors_total", len(errors) - locks, operation=operation)
+
+    def record_transport_error(self, query, error):
+        operation, _ = describe_request(query)
+        self.inc("transport_errors_total", operation=operation, error=type(error).__name__)
+
+    async def sample_periodically(self, probes, interval=0.5):
+        """
+        Nimmt alle interval Sekunden eine Stichprobe von probes ({name: callable}) auf,
+        bis die Task abgebrochen wird.
+        """
+        while True:
+            for name, probe in probes.items():
+                self.sample(name, probe())
+            await asyncio.sleep(interval)
+
+    @contextmanager
+    def profile(self, section, profile_path=None, trace_memory=False, top=15):
+        """
+        Optionales Profiling eines Abschnitts (z.B. Parsen) mit cProfile und/oder tracemalloc.
+        profile_path: Ziel für die cProfile-Daten (auswertbar mit pstats oder snakeviz)
+        """
+        profiler = cProfile.Profile() if profile_path else None
+        if trace_memory:
+            tracemalloc.start()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield
+        finally:
+            result = {}
+            if profiler is not None:
+                profiler.disable()
+                profiler.dump_stats(profile_path)
+                report = io.StringIO()
+                pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(top)
+                logging.info(f"Profil {section} ({profile_path}):\n{report.getvalue()}")
+                result["profile_path"] = profile_path
+            if trace_memory:
+                snapshot = tracemalloc.take_snapshot()
+                current, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                allocations = [
+                    {"location": str(stat.traceback), "size_bytes": stat.size, "count": stat.count}
+                    for stat in snapshot.statistics("lineno")[:top]
+                ]
+                logging.info(f"Speicher {section}: Spitze {peak / 1024 / 1024:.1f} MB, aktuell {current / 1024 / 1024:.1f} MB")
+                for allocation in allocations:
+                    logging.info(f"  {allocation['size_bytes'] / 1024:10.1f} KB  {allocation['location']}")
+                result.update(peak_bytes=peak, current_bytes=current, top_allocations=allocations)
+                self.sample("traced_memory_peak_bytes", peak, section=section)
+            self.profiles[section] = result
+
+    def summary(self):
+        """
+        Zusammenfassung je Operation (Requests, Mutationen, Latenzen, Bytes, Fehler) sowie
+        Phasen, Retries und Stichproben als JSON-fähiges dict.
+        """
+        operations = {}
+
+        def entry(operation):
+            return operations.setdefault(operation, {"requests": 0, "status": {}})
+
+        with self._lock:
+            counters = dict(self.counters)
+            histograms = dict(self.histograms)
+            gauges = dict(self.gauges)
+        other = {}
+        for (name, labels), value in counters.items():
+            labels = dict(labels)
+            operation = labels.pop("operation", None)
+            if operation is None:
+                other.setdefault(name, {})[",".join(f"{k}={v}" for k, v in labels.items()) or "total"] = value
+            elif name == "requests_total":
+                item = entry(operation)
+                item["requests"] += value
+                item["status"][labels["status"]] = value
+            else:
+                item = entry(operation)
+                field = name[:-len("_total")] if name.endswith("_total") else name
+                if labels:
+                    item.setdefault(field, {})[",".join(f"{k}={v}" for k, v in labels.items())] = value
+                else:
+                    item[field] = item.get(field, 0) + value
+        for (name, labels), histogram in histograms.items():
+            operation = dict(labels).get("operation", "unknown")
+            prefix = "latency" if name == "request_duration_seconds" else "slot_wait"
+            entry(operation).update({
+                f"{prefix}_avg_ms": histogram.sum / histogram.count * 1000,
+                f"{prefix}_p50_ms": histogram.quantile(0.5) * 1000,
+                f"{prefix}_p95_ms": histogram.quantile(0.95) * 1000,
+                f"{prefix}_p99_ms": histogram.quantile(0.99) * 1000,
+            })
+        samples = {
+            name + "".join(f"[{k}={v}]" for k, v in labels): {"last": gauge.last, "max": gauge.max, "avg": gauge.avg}
+            for (name, labels), gauge in gauges.items()
+        }
+        return {
+            "phases_seconds": dict(self.phases),
+            "operations": operations,
+            "counters": other,
+            "samples": samples,
+            "profiles": dict(self.profiles),
+        }
+
+    def prometheus(self, prefix="datacat_import_"):
+        """
+        Alle Kennzahlen im Prometheus-Textformat (für den node_exporter-Textfile-Collector).
+        """
+        def labels_text(labels, extra=()):
+            items = [*labels, *extra]
+            if not items:
+                return ""
+            return "{" + ",".join(f'{key}="{value}"' for key, value in items) + "}"
+
+        lines = []
+        with self._lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(self.histograms.items(), key=lambda item: item[0])
+            gauges = sorted(self.gauges.items(), key=lambda item: item[0])
+        typed = set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                lines.append(f"# TYPE {prefix}{name} counter")
+                typed.add(name)
+            lines.append(f"{prefix}{name}{labels_text(labels)} {value}")
+        for (name, labels), histogram in histograms:
+            if name not in typed:
+                lines.append(f"# TYPE {prefix}{name} histogram")
+                typed.add(name)
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f"{prefix}{name}_bucket{labels_text(labels, [('le', le)])} {cumulative}")
+            lines.append(f"{prefix}{name}_sum{labels_text(labels)} {histogram.sum}")
+            lines.append(f"{prefix}{name}_count{labels_text(labels)} {histogram.count}")
+        for (name, labels), gauge in gauges:
+            for stat in ("last", "max", "avg"):
+                metric = f"{prefix}{name}_{stat}"
+                if metric not in typed:
+                    lines.append(f"# TYPE {metric} gauge")
+                    typed.add(metric)
+                lines.append(f"{metric}{labels_text(labels)} {getattr(gauge, stat)}")
+        if self.phases:
+            lines.append(f"# TYPE {prefix}phase_duration_seconds gauge")
+            for phase, seconds in self.phases.items():
+                lines.append(f"{prefix}phase_duration_seconds{labels_text([('phase', phase)])} {seconds}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, json_path=None, prometheus_path=None):
+        if json_path:
+            with open(json_path, "w", encoding="utf-8") as out:
+                json.dump(self.summary(), out, indent=2, ensure_ascii=False)
+        if prometheus_path:
+            with open(prometheus_path, "w", encoding="utf-8") as out:
+                out.write(self.prometheus())
+        logging.info(f"Kennzahlen geschrieben: {', '.join(path for path in (json_path, prometheus_path) if path)}")
+
+    def log_summary(self):
+        """
+        Kurzüberblick je Operation im Log.
+        """
+        for operation, item in sorted(self.summary()["operations"].items()):
+            if "latency_p50_ms" not in item:
+                continue
+            logging.info(
+                f"{operation}: {item['requests']} Requests, {item.get('operations', 0)} Operationen, "
+                f"Latenz p50 {item['latency_p50_ms']:.1f} ms / p99 {item['latency_p99_ms']:.1f} ms, "
+                f"Lock-Konflikte {item.get('lock_conflicts', 0)}, "
+                f"gesendet {item.get('bytes_sent', 0) / 1024:.0f} KB, empfangen {item.get('bytes_received', 0) / 1024:.0f} KB"
+            )
+
+# Kennzahlen des laufenden Imports. Ohne use_metrics gilt die Standardinstanz (Kommandozeile);
+# eingebettete Importe setzen eigene ein, die nur in ihrem Kontext (asyncio-Task bzw. mit
+# contextvars.copy_context gestarteter Thread) sichtbar sind
+_default_metrics = ImportMetrics()
+_current_metrics = contextvars.ContextVar("import_metrics")
+
+class _CurrentMetrics:
+    """
+    Verweist auf die ImportMetrics des aktuellen Kontexts.
+    """
+
+    def __getattr__(self, name):
+        return getattr(_current_metrics.get(_default_metrics), name)
+
+@contextmanager
+def use_metrics(import_metrics):
+    """
+    Setzt import_metrics für die Dauer des Blocks im aktuellen Kontext ein.
+    """
+    token = _current_metrics.set(import_metrics)
+    try:
+        yield import_metrics
+    finally:
+        _current_metrics.reset(token)
+
+# Gemeinsamer Zugriff für alle Module eines Imports
+metrics = _CurrentMetrics()
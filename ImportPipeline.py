@@ -0,0 +1,92 @@
+import asyncio
+import logging
+
+class DependencyTracker:
+    """
+    Hält Beziehungen zurück, bis alle Endpunkte (from_id und alle to_ids) als angelegt
+    bestätigt sind, und gibt sie dann über release frei.
+
+    confirmed: IDs, die bereits existieren (z.B. die Werte von entity_lookup vor dem Import)
+    """
+
+    def __init__(self, release, confirmed=()):
+        self.release = release
+        self.confirmed = set(confirmed)
+        self.waiting = {}  # id -> Liste der wartenden Einträge [offene Endpunkte, rel_args]
+        self.pending = 0
+
+    def add(self, rel_args):
+        _, _, from_id, to_ids = rel_args
+        missing = {from_id, *to_ids} - self.confirmed
+        if not missing:
+            self.release(rel_args)
+            return
+        entry = [len(missing), rel_args]
+        for entity_id in missing:
+            self.waiting.setdefault(entity_id, []).append(entry)
+        self.pending += 1
+
+    def confirm(self, entity_id):
+        if entity_id in self.confirmed:
+            return
+        self.confirmed.add(entity_id)
+        for entry in self.waiting.pop(entity_id, ()):
+            entry[0] -= 1
+            if entry[0] == 0:
+                self.pending -= 1
+                self.release(entry[1])
+
+    def close(self):
+        """
+        Protokolliert alle Beziehungen, deren Endpunkte nie bestätigt wurden.
+        """
+        unresolved = {id(entry): entry for entries in self.waiting.values() for entry in entries}
+        for _, (open_count, (rel_type, _, from_id, to_ids)) in unresolved.items():
+            missing = [entity_id for entity_id in (from_id, *to_ids) if entity_id not in self.confirmed]
+            logging.error(f"Beziehung nicht angelegt, Endpunkte fehlen: type={rel_type}, fromId={from_id}, toId={to_ids}, fehlend={missing}")
+        self.waiting.clear()
+        self.pending = 0
+
+class ThreadSafeSink:
+    """
+    Nimmt Einträge aus einem Parser-Thread über append entgegen (wie eine Liste) und
+    reicht sie blockweise an den Event-Loop weiter.
+
+    Ist eine asyncio.Queue angegeben, blockiert die Übergabe, bis dort Platz ist (Gegendruck
+    auf den Parser). Sonst wird callback(item) im Event-Loop aufgerufen. Nach dem Parsen
+    muss flush() aufgerufen werden.
+    """
+
+    def __init__(self, loop, queue=None, callback=None, transform=None, chunk_size=100):
+        self.loop = loop
+        self.queue = queue
+        self.callback = callback
+        self.transform = transform
+        self.chunk_size = chunk_size
+        self.buffer = []
+        self.count = 0
+
+    def append(self, item):
+        if self.transform is not None:
+            item = self.transform(item)
+        self.count += 1
+        self.buffer.append(item)
+        if len(self.buffer) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        items, self.buffer = self.buffer, []
+        if not items:
+            return
+        if self.queue is not None:
+            asyncio.run_coroutine_threadsafe(self._put_all(items), self.loop).result()
+        else:
+            self.loop.call_soon_threadsafe(self._call_all, items)
+
+    async def _put_all(self, items):
+        for item in items:
+            await self.queue.put(item)
+
+    def _call_all(self, items):
+        for item in items:
+            self.callback(item)
@@ -0,0 +1,113 @@
+import gzip
+import hashlib
+import json
+import os
+from PlanModel import PlannedEntity
+
+PLAN_FORMAT = 1
+
+def source_digest(file_path, chunk_size=1 << 20):
+    """
+    SHA-256 der Quelldatei; identifiziert die Katalogversion, aus der ein Plan stammt.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as source:
+        for chunk in iter(lambda: source.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def default_plan_path(digest):
+    return f"import_plan_{digest[:16]}.jsonl"
+
+def _open(path, mode, compressed=None):
+    if compressed is None:
+        compressed = path.endswith(".gz")
+    if compressed:
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+class PlanWriter:
+    """
+    Schreibt einen Import-Plan als JSONL (mit Endung .gz komprimiert), eine Zeile je Eintrag:
+
+        ["H", {"format": 1, "source": <sha256>, ...}]      Kopf
+        ["D", id, typ, name, description, data_type]      Dictionary
+        ["E", id, typ, name, description, data_type]      Entity (typ: Name des EntityType)
+        ["P", n, properties]                              geteilte Beziehungs-Properties
+        ["R", relationship_type, n|null, from_id, [to_ids]]
+
+    Alle Entities stehen vor den Beziehungen. Die Datei erscheint erst nach close() unter
+    path, ein abgebrochener Plan wird also nie als vollständig gelesen.
+    """
+
+    def __init__(self, path, header):
+        self.path = path
+        self.temp_path = path + ".tmp"
+        self.out = _open(self.temp_path, "w", compressed=path.endswith(".gz"))
+        self.props_ids = {}  # id(props) -> n
+        self.entities = 0
+        self.relationships = 0
+        self._write(["H", {"format": PLAN_FORMAT, **header}])
+
+    def _write(self, record):
+        self.out.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+        self.out.write("\n")
+
+    def _entity(self, kind, attributes):
+        self._write([kind, attributes.id, attributes.entity_type.name, attributes.name, attributes.description,
+                     attributes.data_type])
+
+    def dictionary(self, attributes):
+        self._entity("D", attributes)
+
+    def entity(self, attributes):
+        self._entity("E", attributes)
+        self.entities += 1
+
+    def relationship(self, rel_args):
+        rel_type, props, from_id, to_ids = rel_args
+        props_id = None
+        if props is not None:
+            props_id = self.props_ids.get(id(props))
+            if props_id is None:
+                props_id = self.props_ids[id(props)] = len(self.props_ids)
+                self._write(["P", props_id, props])
+        self._write(["R", getattr(rel_type, "value", rel_type), props_id, from_id, list(to_ids)])
+        self.relationships += 1
+
+    def close(self):
+        self.out.close()
+        os.replace(self.temp_path, self.path)
+
+def read_plan_header(path):
+    """
+    Liefert den Kopf eines Plans oder None, wenn die Datei fehlt oder kein Plan ist.
+    """
+    if not os.path.exists(path):
+        return None
+    with _open(path, "r") as plan:
+        record = json.loads(plan.readline() or "null")
+    if not record or record[0] != "H" or record[1].get("format") != PLAN_FORMAT:
+        return None
+    return record[1]
+
+def iter_plan(path, entity_types, rel_types):
+    """
+    Liest einen Plan zeilenweise. Liefert ("dictionary", PlannedEntity), ("entity", PlannedEntity)
+    und ("relationship", (relationship_type, props, from_id, [to_ids])) in Dateireihenfolge.
+    entity_types / rel_types: Abbildung der gespeicherten Namen auf EntityType bzw. RelType.
+    """
+    props = {}
+    with _open(path, "r") as plan:
+        for line in plan:
+            record = json.loads(line)
+            kind = record[0]
+            if kind == "R":
+                _, rel_type, props_id, from_id, to_ids = record
+                yield "relationship", (rel_types[rel_type], props.get(props_id), from_id, to_ids)
+            elif kind == "E" or kind == "D":
+                _, id, type_name, name, description, data_type = record
+                entity = PlannedEntity(id, entity_types[type_name], name, description, data_type)
+                yield ("entity" if kind == "E" else "dictionary"), entity
+            elif kind == "P":
+                props[record[1]] = record[2]
@@ -0,0 +1,86 @@
+import json
+import marshal
+import mmap
+import os
+from PlanModel import PlannedEntity
+
+CACHE_MAGIC = b"DCPC"
+CACHE_FORMAT = 1
+
+def write_parse_cache(path, key, ns, dictAttrs, entities, relationships):
+    """
+    Speichert das Zwischenmodell eines frisch (ohne vorhandene Einträge) geparsten
+    Katalogs: Namespaces, Dictionary, Entities und die Beziehungen vor der Optimierung.
+
+    Aufbau: CACHE_MAGIC, Länge des Kopfs (4 Byte), Kopf als JSON (key und Format),
+    danach die Daten als marshal-Tupel mit spaltenweise abgelegten Entities und
+    geteilten Beziehungs-Properties. Die Datei erscheint erst vollständig unter path.
+    """
+    type_names = []
+    type_index = {}
+    columns = ([], [], [], [], [])  # id, typ, name, description, data_type
+    for attrs in [dictAttrs, *entities]:
+        type_name = attrs.entity_type.name
+        if type_name not in type_index:
+            type_index[type_name] = len(type_names)
+            type_names.append(type_name)
+        for column, value in zip(columns, (attrs.id, type_index[type_name], attrs.name, attrs.description,
+                                           attrs.data_type)):
+            column.append(value)
+
+    props_table = []
+    props_index = {}  # id(props) -> Index
+    records = []
+    for rel_type, props, from_id, to_ids in relationships:
+        index = -1
+        if props is not None:
+            index = props_index.get(id(props))
+            if index is None:
+                index = props_index[id(props)] = len(props_table)
+                props_table.append(props)
+        records.append((getattr(rel_type, "value", rel_type), index, from_id, tuple(to_ids)))
+
+    payload = marshal.dumps((tuple(ns.items()), tuple(type_names), tuple(map(tuple, columns)),
+                             tuple(props_table), tuple(records)))
+    header = json.dumps({"format": CACHE_FORMAT, **key}).encode("utf-8")
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as cache:
+        cache.write(CACHE_MAGIC)
+        cache.write(len(header).to_bytes(4, "little"))
+        cache.write(header)
+        cache.write(payload)
+    os.replace(temp_path, path)
+
+def load_parse_cache(path, key, entity_types, rel_types):
+    """
+    Lädt ein mit write_parse_cache gespeichertes Modell, wenn Kopf und key übereinstimmen.
+    Die Datei wird gemappt und direkt aus dem Mapping entpackt, ohne sie vorher zu lesen.
+    entity_types / rel_types: Abbildung der gespeicherten Namen auf EntityType bzw. RelType.
+    Liefert (ns, dictAttrs, entities, relationships) oder None.
+    """
+    if not os.path.exists(path) or os.path.getsize(path) <= len(CACHE_MAGIC) + 4:
+        return None
+    with open(path, "rb") as cache, mmap.mmap(cache.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        if mapped[:len(CACHE_MAGIC)] != CACHE_MAGIC:
+            return None
+        offset = len(CACHE_MAGIC) + 4
+        header_end = offset + int.from_bytes(mapped[len(CACHE_MAGIC):offset], "little")
+        header = json.loads(mapped[offset:header_end])
+        if header != {"format": CACHE_FORMAT, **key}:
+            return None
+        view = memoryview(mapped)
+        try:
+            ns_items, type_names, columns, props_table, records = marshal.loads(view[header_end:])
+        finally:
+            view.release()
+
+    types = [entity_types[type_name] for type_name in type_names]
+    entities = [
+        PlannedEntity(id, types[type_index], name, description, data_type)
+        for id, type_index, name, description, data_type in zip(*columns)
+    ]
+    relationships = [
+        (rel_types[rel_type], props_table[index] if index >= 0 else None, from_id, list(to_ids))
+        for rel_type, index, from_id, to_ids in records
+    ]
+    return dict(ns_items), entities[0], entities[1:], relationships
@@ -0,0 +1,70 @@
+import hashlib
+import sys
+import uuid
+
+# Namensraum der deterministischen Entity-IDs (uuid5)
+ENTITY_ID_NAMESPACE = uuid.UUID("8f0c6a5e-3b8e-5d1c-9a43-6f2d1c7e9b10")
+
+def _key_text(*parts):
+    # None und "" bleiben unterscheidbar, Trennzeichen kommen in Namen nicht vor
+    return "\x1f".join("\x00" if part is None else "\x01" + part for part in parts)
+
+def entity_key(name, type_name, description):
+    """
+    Fester 16-Byte-Schlüssel für entity_lookup aus (name, typ, description). Ersetzt
+    Tupel mit vollständigen Beschreibungstexten, die sonst für die gesamte Laufzeit
+    im Lookup gehalten würden.
+    """
+    return hashlib.blake2b(_key_text(name, type_name, description).encode("utf-8"), digest_size=16).digest()
+
+def entity_uuid(tag_id, name, type_name, description):
+    """
+    Deterministische ID (uuid5) aus Tag und denselben Feldern wie entity_key: Wiederholte
+    Importe desselben Katalogs vergeben dieselben IDs.
+    """
+    return str(uuid.uuid5(ENTITY_ID_NAMESPACE, _key_text(tag_id, name, type_name, description)))
+
+class PlannedEntity:
+    """
+    Kompakter Eintrag des Import-Plans. Die GraphQL-Properties werden erst beim
+    Senden über properties() gebaut, nicht für jede Entity vorab als verschachteltes
+    dict gehalten.
+
+    entity_type: EntityType (Enum, von allen Einträgen geteilt)
+    is_new: False für bereits vorhandene Entities, die nur noch verknüpft werden
+    """
+    __slots__ = ("id", "entity_type", "name", "description", "data_type", "is_new")
+
+    def __init__(self, id, entity_type, name=None, description=None, data_type=None, is_new=True):
+        self.id = id
+        self.entity_type = entity_type
+        # Namen wiederholen sich häufig (Attribute, gemeinsame Werte) und werden geteilt
+        self.name = sys.intern(name) if name is not None else None
+        self.description = description
+        self.data_type = data_type
+        self.is_new = is_new
+
+    @property
+    def type_name(self):
+        return self.entity_type.value[1]
+
+    @property
+    def key(self):
+        return entity_key(self.name, self.type_name, self.description)
+
+    def properties(self):
+        """
+        Baut die Properties für createCatalogEntry.
+        """
+        properties = {"names": {"languageTag": "de", "value": self.name}}
+        if self.description is not None:
+            properties["descriptions"] = {"languageTag": "de", "value": self.description}
+        properties["id"] = self.id
+        if self.data_type is not None:
+            properties["propertyProperties"] = {"dataType": self.data_type}
+        if self.type_name == "ValueList":
+            properties["valueListProperties"] = {"languageTag": "de"}
+        return properties
+
+    def __repr__(self):
+        return f"PlannedEntity({self.entity_type.name}, {self.name!r}, id={self.id})"
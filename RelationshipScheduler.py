@@ -0,0 +1,199 @@
+import asyncio
+from collections import deque
+from ImportLogging import phase_logger
+from ImportMetrics import metrics
+from RetryPolicy import RetryPolicy
+
+log = phase_logger("relationships")
+
+class RelationshipScheduler:
+    """
+    Verteilt Beziehungen so auf parallele Requests, dass zwei gleichzeitig laufende
+    Requests nie dieselbe Entity sperren.
+
+    Jede Beziehung sperrt ihre from_id und alle to_ids (der Server sperrt beim Anlegen
+    beide Endpunkte). Beziehungen werden je from_id in einer geordneten Warteschlange
+    gehalten und reihum zu Batches zusammengestellt. Eine Beziehung wird nur eingeplant,
+    wenn keiner ihrer Sperrschlüssel von einem laufenden Batch gehalten wird; sonst ruht
+    ihre Warteschlange, bis dieser Schlüssel frei wird. Innerhalb eines Batches führt der
+    Server die Mutationen nacheinander aus.
+
+    send_batch: async callable(batch) -> Liste der Beziehungen mit Lock-Konflikt
+    retry_policy: bestimmt Anzahl der Versuche und Backoff bei Lock-Konflikten
+    max_targets: Höchstzahl von Ziel-IDs je from_id in einem Batch (None = unbegrenzt). Weitere
+        Teile derselben from_id folgen in späteren Batches, damit kein einzelner Request die
+        Sperre einer Entity lange hält.
+    shared_with: anderer Scheduler, der gleichzeitig läuft und dieselben Entities sperrt
+        (z.B. der Dictionary-Linker neben dem Haupt-Scheduler). Beide führen dann eine
+        gemeinsame Menge gehaltener Sperrschlüssel und wecken beim Freigeben auch die
+        Warteschlangen des anderen.
+    """
+
+    def __init__(self, send_batch, max_in_flight, batch_size, retry_policy=None, max_targets=None,
+                 shared_with=None):
+        self.send_batch = send_batch
+        self.max_in_flight = max_in_flight
+        self.batch_size = batch_size
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.max_targets = max_targets
+        self.queues = {}  # from_id -> deque of (rel_args, lock_keys)
+        self.ready = deque()  # from_ids, deren nächste Beziehung vermutlich startbar ist (Round-Robin)
+        self.blocked_on = {}  # Sperrschlüssel -> deque der from_ids, die auf ihn warten
+        self.free_waiting = set()  # freigegebene Schlüssel, auf die noch Warteschlangen warten
+        self.held = set()  # Sperrschlüssel laufender Batches (aller Scheduler mit gemeinsamen Sperren)
+        self.peers = [self]  # Scheduler mit gemeinsamen Sperrschlüsseln
+        if shared_with is not None:
+            self.held = shared_with.held
+            self.peers = shared_with.peers
+            self.peers.append(self)
+        self.in_flight = set()  # laufende Batches
+        self.pending = 0
+        self.closed = False
+        self._wakeup = asyncio.Event()
+        self._progress = asyncio.Event()
+
+    @staticmethod
+    def lock_keys(rel_args):
+        _, _, from_id, to_ids = rel_args
+        return {from_id, *to_ids}
+
+    def submit(self, rel_args):
+        from_id = rel_args[2]
+        queue = self.queues.get(from_id)
+        if queue is None:
+            queue = self.queues[from_id] = deque()
+            self.ready.append(from_id)
+        queue.append((rel_args, self.lock_keys(rel_args)))
+        self.pending += 1
+        self._wakeup.set()
+
+    async def wait_below(self, limit):
+        """
+        Wartet, bis weniger als limit Beziehungen auf ihren Start warten. Gegendruck für
+        Einreichende, die Beziehungen aus einem Datenstrom nachliefern.
+        """
+        while self.pending >= limit:
+            self._progress.clear()
+            await self._progress.wait()
+
+    def close(self):
+        """
+        Signalisiert, dass keine weiteren Beziehungen mehr eingereicht werden.
+        """
+        self.closed = True
+        self._wakeup.set()
+
+    def _next_batch(self):
+        batch = []
+        batch_keys = set()
+        targets = {}  # from_id -> Ziel-IDs in diesem Batch
+        deferred = []  # from_ids, die ihr Ziel-Kontingent im Batch ausgeschöpft haben
+        while len(batch) < self.batch_size:
+            if not self.ready and not self._wake_free():
+                break
+            from_id = self.ready.popleft()
+            queue = self.queues[from_id]
+            rel_args, keys = queue[0]
+            blocker = next((key for key in keys if key in self.held), None)
+            if blocker is not None:
+                # Warteschlange ruht, bis der blockierende Schlüssel freigegeben wird
+                self.blocked_on.setdefault(blocker, deque()).append(from_id)
+                continue
+            count = targets.get(from_id, 0) + len(rel_args[3])
+            if self.max_targets is not None and from_id in targets and count > self.max_targets:
+                deferred.append(from_id)
+                continue
+            targets[from_id] = count
+            queue.popleft()
+            batch.append(rel_args)
+            batch_keys |= keys
+            self.pending -= 1
+            if queue:
+                self.ready.append(from_id)
+            else:
+                del self.queues[from_id]
+        # Zurückgestellte Warteschlangen kommen im nächsten Batch zuerst an die Reihe
+        self.ready.extendleft(reversed(deferred))
+        self.held |= batch_keys
+        return batch, batch_keys
+
+    def _wake(self, key):
+        """
+        Weckt höchstens einen Batch voller Warteschlangen, die auf key warten. Da sich
+        Beziehungen innerhalb eines Batches einen Schlüssel teilen dürfen, würden weitere
+        ohnehin erneut auf key warten.
+        """
+        waiters = self.blocked_on[key]
+        for _ in range(min(len(waiters), self.batch_size)):
+            self.ready.append(waiters.popleft())
+        if waiters:
+            self.free_waiting.add(key)
+        else:
+            del self.blocked_on[key]
+            self.free_waiting.discard(key)
+
+    def _wake_free(self):
+        while self.free_waiting:
+            key = self.free_waiting.pop()
+            if key not in self.held and key in self.blocked_on:
+                self._wake(key)
+                return True
+        return False
+
+    def _release(self, batch_keys):
+        self.held -= batch_keys
+        for scheduler in self.peers:
+            woken = False
+            for key in batch_keys:
+                if key in scheduler.blocked_on:
+                    scheduler._wake(key)
+                    woken = True
+            if woken and scheduler is not self:
+                scheduler._wakeup.set()
+
+    async def _send(self, batch, batch_keys):
+        max_retries = self.retry_policy.max_retries
+        try:
+            for attempt in range(1, max_retries + 1):
+                conflicts = await self.send_batch(batch)
+                if not conflicts:
+                    return
+                if attempt == max_retries:
+                    for rel_type, _, from_id, to_ids in conflicts:
+                        log.error("Lock-Konflikt nach %s Versuchen: type=%s, fromId=%s, toId=%s", max_retries, rel_type, from_id, to_ids)
+                    return
+                # Konflikte stammen von fremden Schreibzugriffen; Sperrschlüssel bleiben gehalten,
+                # damit die Reihenfolge je Entity erhalten bleibt
+                metrics.inc("retries_total", len(conflicts), reason="lock_conflict")
+                await asyncio.sleep(self.retry_policy.backoff(attempt))
+                batch = conflicts
+        except Exception as e:
+            for rel_type, _, from_id, to_ids in batch:
+                log.error("Fehler beim Anlegen der Beziehung: %s\nBeziehungsparameter: type=%s, fromId=%s, toId=%s", e, rel_type, from_id, to_ids)
+        finally:
+            self._release(batch_keys)
+            self._wakeup.set()
+            self._progress.set()
+
+    async def run(self):
+        """
+        Arbeitet alle eingereichten Beziehungen ab, bis close() aufgerufen wurde
+        und keine Beziehung mehr wartet oder läuft.
+        """
+        in_flight = self.in_flight
+        while True:
+            self._wakeup.clear()
+            while len(in_flight) < self.max_in_flight and self.pending:
+                batch, batch_keys = self._next_batch()
+                if not batch:
+                    break
+                in_flight.add(asyncio.ensure_future(self._send(batch, batch_keys)))
+
+            if not in_flight and self.closed and not self.pending:
+                return
+
+            wakeup = asyncio.ensure_future(self._wakeup.wait())
+            done, _ = await asyncio.wait(in_flight | {wakeup}, return_when=asyncio.FIRST_COMPLETED)
+            if wakeup not in done:
+                wakeup.cancel()
+            in_flight.difference_update(done)
@@ -0,0 +1,199 @@
+import asyncio
+import contextvars
+import random
+import threading
+import time
+from ImportLogging import log_counts, phase_logger
+from ImportMetrics import metrics
+
+log = phase_logger("requests")
+
+# Klassifizierung eines Request-Ergebnisses
+OK = "ok"
+RETRY = "retry"  # vorübergehender Serverfehler (Timeout, Verbindungsabbruch, 408/429/5xx)
+LOCK = "lock"  # Lock-Konflikt, nichts wurde geschrieben
+AUTH = "auth"  # Token abgelaufen oder ungültig
+FATAL = "fatal"
+
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+AUTH_MESSAGES = ("unauthorized", "unauthenticated", "token expired", "jwt expired")
+
+class RequestFailed(Exception):
+    """
+    Ein Request ist endgültig fehlgeschlagen (nicht wiederholbarer Fehler oder
+    alle Versuche aufgebraucht). status: HTTP-Status, falls vorhanden.
+    """
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+def classify(status, result):
+    """
+    Ordnet HTTP-Status und GraphQL-Antwort einer der Klassen OK, RETRY, LOCK, AUTH, FATAL zu.
+    Fehler in einzelnen Mutationen eines Batches gelten als OK, solange andere Mutationen
+    Daten geliefert haben; diese Fehler werten die Aufrufer je Alias aus.
+    """
+    if status == 401:
+        return AUTH
+    if status in RETRYABLE_STATUS:
+        return RETRY
+    if status >= 400:
+        return FATAL
+    errors = result.get("errors")
+    if not errors:
+        return OK
+    messages = [str(error.get("message", "")).lower() for error in errors]
+    if any(message in text for text in messages for message in AUTH_MESSAGES) \
+            or any((error.get("extensions") or {}).get("classification") == "UNAUTHORIZED" for error in errors):
+        return AUTH
+    if any((result.get("data") or {}).values()):
+        return OK
+    if all("lock" in text for text in messages):
+        return LOCK
+    return OK
+
+def error_class(status, error, kind):
+    if error is not None:
+        return type(error).__name__
+    if status is not None and status >= 400:
+        return f"HTTP {status}"
+    return kind
+
+class RetryPolicy:
+    """
+    Gemeinsame Wiederholungsstrategie aller GraphQL-Requests (synchron und asynchron).
+
+    - Exponentielles Backoff mit vollem Jitter: Wartezeit zufällig zwischen 0 und
+      min(max_delay, base_delay * 2^(Versuch-1))
+    - Vorübergehende Fehler und vollständige Lock-Konflikte werden bis zu max_retries
+      mal wiederholt, andere Fehler sofort gemeldet
+    - Bei abgelaufenem Token wird neu angemeldet (relogin) und der Request mit dem neuen
+      Token wiederholt; alle Aufrufer mit dem alten Token erhalten das neue, ohne selbst
+      neu anzumelden
+    - Circuit Breaker: Nach breaker_threshold aufeinanderfolgenden vorübergehenden Fehlern
+      pausieren alle Requests für breaker_cooldown Sekunden. Schlägt der erste Request
+      danach erneut fehl, öffnet der Breaker sofort wieder.
+    """
+
+    def __init__(self, max_retries=5, base_delay=0.5, max_delay=30.0, breaker_threshold=10,
+                 breaker_cooldown=30.0, relogin=None):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self.relogin = relogin
+        self.failures = 0
+        self.open_until = 0.0
+        self.tokens = {}  # abgelaufenes Token -> neues Token
+        self._token_lock = threading.Lock()
+
+    def backoff(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def current_token(self, token):
+        while token in self.tokens:
+            token = self.tokens[token]
+        return token
+
+    def refresh_token(self, token):
+        """
+        Meldet neu an, sofern nicht bereits ein anderer Aufrufer das Token erneuert hat.
+        """
+        with self._token_lock:
+            if token not in self.tokens:
+                log.warning("Token abgelaufen, melde neu an")
+                self.tokens[token] = self.relogin()
+            return self.current_token(token)
+
+    def breaker_delay(self):
+        return max(0.0, self.open_until - time.monotonic())
+
+    def record_success(self):
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.breaker_threshold and not self.breaker_delay():
+            self.open_until = time.monotonic() + self.breaker_cooldown
+            metrics.inc("circuit_breaker_open_total")
+            log.warning("%s fehlgeschlagene Requests in Folge - pausiere alle Requests für %g Sekunden", self.failures, self.breaker_cooldown)
+
+    def _outcome(self, attempt, relogins, token, status, result, error, retry_locks):
+        """
+        Wertet einen Versuch aus. Liefert ("return", result), ("retry", Wartezeit)
+        oder ("relogin", None); wirft RequestFailed bei endgültigem Fehlschlag.
+        """
+        kind = RETRY if error is not None else classify(status, result)
+        if kind == OK:
+            self.record_success()
+            return "return", result
+        if kind == AUTH and token is not None and self.relogin is not None and relogins < self.max_retries:
+            metrics.inc("retries_total", reason=AUTH)
+            return "relogin", None
+        if kind == RETRY:
+            self.record_failure()
+        elif kind == LOCK:
+            self.record_success()
+        if (kind == RETRY or kind == LOCK and retry_locks) and attempt < self.max_retries:
+            metrics.inc("retries_total", reason=kind)
+            # Wiederholungen nur zählen und am Ende je Fehlerklasse zusammenfassen
+            log_counts.count("Wiederholte Requests", error_class(status, error, kind))
+            return "retry", self.backoff(attempt)
+        if kind == LOCK:
+            return "return", result
+        metrics.inc("failed_requests_total", reason=kind)
+        detail = error if error is not None else (f"HTTP {status}" if status >= 400 else result.get("errors"))
+        raise RequestFailed(f"Request nach {attempt} Versuch(en) fehlgeschlagen: {detail}", status)
+
+    def call(self, send, token=None, transient=(), retry_locks=True):
+        """
+        Führt send(token) -> (status, result) mit Wiederholungen aus. Ausnahmen aus
+        transient gelten als vorübergehende Fehler. Mit retry_locks=False werden
+        Lock-Konflikte dem Aufrufer überlassen (z.B. dem RelationshipScheduler).
+        """
+        attempt = 1
+        relogins = 0
+        while True:
+            time.sleep(self.breaker_delay())
+            token = self.current_token(token)
+            try:
+                status, result = send(token)
+                action, value = self._outcome(attempt, relogins, token, status, result, None, retry_locks)
+            except transient as e:
+                action, value = self._outcome(attempt, relogins, token, None, None, e, retry_locks)
+            if action == "return":
+                return value
+            if action == "relogin":
+                # Neuanmeldung zählt nicht als Fehlversuch
+                token = self.refresh_token(token)
+                relogins += 1
+                continue
+            time.sleep(value)
+            attempt += 1
+
+    async def call_async(self, send, token=None, transient=(), retry_locks=True):
+        """
+        Async-Variante von call; send ist eine Coroutine-Funktion. Das Neuanmelden
+        läuft in einem Thread, damit der Event-Loop nicht blockiert.
+        """
+        attempt = 1
+        relogins = 0
+        while True:
+            await asyncio.sleep(self.breaker_delay())
+            token = self.current_token(token)
+            try:
+                status, result = await send(token)
+                action, value = self._outcome(attempt, relogins, token, status, result, None, retry_locks)
+            except transient as e:
+                action, value = self._outcome(attempt, relogins, token, None, None, e, retry_locks)
+            if action == "return":
+                return value
+            if action == "relogin":
+                token = await asyncio.get_running_loop().run_in_executor(
+                    None, contextvars.copy_context().run, self.refresh_token, token)
+                relogins += 1
+                continue
+            await asyncio.sleep(value)
+            attempt += 1
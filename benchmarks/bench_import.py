@@ -0,0 +1,116 @@
+"""
+Benchmark des vollständigen Imports (main.py) gegen den lokalen DataCat-Ersatz
+(mock_datacat.py) mit synthetischen Katalogen verschiedener Größe.
+
+Je Größe wird ein frischer Ersatzserver gestartet und main.py in einem eigenen Prozess
+ausgeführt. Gemessen werden Laufzeit, Requests (Round Trips) je Sekunde, Mutationen,
+serverseitige Latenz (p50/p99) und die Spitzen-RSS des Importprozesses. Unbekannte
+Argumente werden an main.py durchgereicht (z.B. --pipeline).
+
+Aufruf:
+    python benchmarks/bench_import.py --sizes 1 5 20 --latency 0.02 --lock-rate 0.01
+    python benchmarks/bench_import.py --sizes 5 --pipeline --json results.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from mock_datacat import MockDataCat
+from synthetic_catalogue import write_catalogue_of_size
+
+def run_import(server, file_path, work_dir, import_args, env_overrides):
+    """
+    Führt main.py gegen server aus. Liefert (Sekunden, Spitzen-RSS in MB, Exit-Code).
+    """
+    env = dict(os.environ)
+    env.update({"DATACAT_URL": server.url, "DATACAT_USERNAME": "benchmark", "DATACAT_PASSWORD": "benchmark"})
+    env.update(env_overrides)
+    command = [sys.executable, os.path.join(REPO_DIR, "main.py"), "--file", file_path,
+               "--journal", os.path.join(work_dir, "import_journal.sqlite"), *import_args]
+    start = time.perf_counter()
+    process = subprocess.Popen(command, cwd=work_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return time.perf_counter() - start, usage.ru_maxrss / 1024, process.returncode
+
+def run_benchmark(size_mb, server_options, import_args, env_overrides, cache_dir):
+    file_path = os.path.join(cache_dir, f"synthetic_{size_mb:g}mb.xml")
+    if not os.path.exists(file_path):
+        write_catalogue_of_size(file_path, size_mb)
+    work_dir = tempfile.mkdtemp(prefix="bench_import_")
+    with MockDataCat(**server_options) as server:
+        seconds, peak_rss_mb, returncode = run_import(server, file_path, work_dir, import_args, env_overrides)
+        stats = server.stats()
+    mutations = sum(count for operation, count in stats["operations"].items()
+                    if operation in ("createCatalogEntry", "createRelationship", "addTag"))
+    return {
+        "size_mb": size_mb,
+        "file_mb": os.path.getsize(file_path) / 1024 / 1024,
+        "returncode": returncode,
+        "seconds": seconds,
+        "requests": stats["requests"],
+        "requests_per_second": stats["requests"] / seconds,
+        "mutations": mutations,
+        "mutations_per_second": mutations / seconds,
+        "latency_p50_ms": (stats["latency_p50"] or 0) * 1000,
+        "latency_p99_ms": (stats["latency_p99"] or 0) * 1000,
+        "peak_rss_mb": peak_rss_mb,
+        "log": os.path.join(work_dir, "logfile.txt"),
+        "server": stats,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark: vollständiger Import gegen lokalen DataCat-Ersatz")
+    parser.add_argument("--sizes", type=float, nargs="+", default=[1, 5, 20], help="Kataloggrößen in MB")
+    parser.add_argument("--latency", type=float, default=0.02, help="Serverlatenz je Request in Sekunden")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Anteil der Requests mit HTTP 503")
+    parser.add_argument("--lock-rate", type=float, default=0.0, help="Anteil der Beziehungen mit Lock-Konflikt")
+    parser.add_argument("--capacity", type=int, default=0, help="Parallel bearbeitete Requests des Servers (0 = unbegrenzt)")
+    parser.add_argument("--token-expiry", type=int, default=0, help="Neues Token nach so vielen Requests (0 = nie)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--env", action="append", default=[], metavar="NAME=WERT",
+                        help="Zusätzliche Umgebungsvariable für den Import (z.B. DATACAT_CONCURRENCY=50)")
+    parser.add_argument("--cache-dir", default=os.path.join(tempfile.gettempdir(), "datacat_bench"),
+                        help="Verzeichnis für die synthetischen Kataloge")
+    parser.add_argument("--json", help="Ergebnisse zusätzlich als JSON in diese Datei schreiben")
+    args, import_args = parser.parse_known_args()
+
+    os.makedirs(args.cache_dir, exist_ok=True)
+    server_options = {
+        "latency": args.latency,
+        "error_rate": args.error_rate,
+        "lock_rate": args.lock_rate,
+        "capacity": args.capacity,
+        "token_expiry": args.token_expiry,
+        "seed": args.seed,
+    }
+    env_overrides = dict(item.split("=", 1) for item in args.env)
+
+    results = []
+    failed = False
+    for size_mb in args.sizes:
+        result = run_benchmark(size_mb, server_options, import_args, env_overrides, args.cache_dir)
+        results.append(result)
+        server = result["server"]
+        print(f"{result['file_mb']:7.1f} MB: {result['seconds']:8.2f} s  {result['requests']:7d} Requests "
+              f"({result['requests_per_second']:7.1f}/s)  {result['mutations']:8d} Mutationen "
+              f"({result['mutations_per_second']:8.1f}/s)  p50 {result['latency_p50_ms']:6.1f} ms  "
+              f"p99 {result['latency_p99_ms']:6.1f} ms  Spitzen-RSS {result['peak_rss_mb']:7.1f} MB  "
+              f"Entries {server['entries']}  Relationen {server['relationship_targets']}  "
+              f"Lock-Konflikte {server['lock_conflicts']}  Antworten {server['responses']}")
+        if result["returncode"] != 0:
+            print(f"FEHLER: Import beendet mit Code {result['returncode']}, siehe {result['log']}")
+            failed = True
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as out:
+            json.dump(results, out, indent=2)
+    sys.exit(1 if failed else 0)
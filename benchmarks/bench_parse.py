@@ -0,0 +1,154 @@
+"""
+Benchmark des XML-Einlesens: Baum-basierter Durchlauf (ET.parse + findall, bisheriger Weg
+über process_feature_type) gegen den strombasierten parse_feature_catalogue.
+
+Jede Variante läuft in einem eigenen Prozess, damit die Spitzen-RSS getrennt gemessen wird.
+
+Aufruf:
+    python benchmarks/bench_parse.py --size-mb 300
+    python benchmarks/bench_parse.py --file resources/aaa.xml
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+def parse_feature_catalogue_tree(main, file_path, tasks, relationship_tasks):
+    """
+    Bisheriger Weg: Namespaces vorab per iterparse, danach ET.parse des ganzen Baums.
+    """
+    XmlTag, EntityType, RelType = main.XmlTag, main.EntityType, main.RelType
+    ns = {}
+    for event, elem in ET.iterparse(file_path, events=("start-ns", "start")):
+        if event == "start-ns":
+            ns[elem[0] or ""] = elem[1]
+
+    root = ET.parse(file_path).getroot()
+    dictAttrs = main.prepare_entity_attributes(root, EntityType.DICTIONARY, ns)
+    attrs2 = None
+    for child in root.findall(XmlTag.CONNECTOR.tag(ns)):
+        level1 = child[0]
+        if level1.tag == XmlTag.OBJEKTARTENBEREICH.tag(ns):
+            attrs1 = main.prepare_entity_attributes(level1, EntityType.THEMA, ns)
+            if attrs1.is_new:
+                tasks.append(attrs1)
+            collected_theme_ids = []
+            collected_class_ids = []
+            for element1 in level1.findall(XmlTag.CONNECTOR.tag(ns)):
+                level2 = element1[0]
+                if level2.tag == XmlTag.OBJEKTARTENGRUPPE.tag(ns):
+                    attrs2 = main.prepare_entity_attributes(level2, EntityType.THEMA, ns)
+                    if attrs2.is_new:
+                        tasks.append(attrs2)
+                    collected_theme_ids.append(attrs2.id)
+                    collected_class_ids = []
+                    for element2 in level2.findall(XmlTag.CONNECTOR.tag(ns)):
+                        level3 = element2[0]
+                        if level3.tag == XmlTag.FEATURETYPE.tag(ns) or level3.tag == XmlTag.DATATYPE.tag(ns):
+                            main.process_feature_type(level3, collected_class_ids, tasks, relationship_tasks, ns, 4)
+                        else:
+                            main.log_unknown_schema_type(3, level3.tag)
+                elif level2.tag == XmlTag.FEATURETYPE.tag(ns) or level2.tag == XmlTag.DATATYPE.tag(ns):
+                    main.process_feature_type(level2, collected_class_ids, tasks, relationship_tasks, ns, 3)
+                else:
+                    main.log_unknown_schema_type(2, level2.tag)
+                if attrs2 is not None:
+                    relationship_tasks.append((RelType.RELATIONSHIP_TO_SUBJECT, main.REL_TO_SUBJ_PROPS, attrs2.id, collected_class_ids))
+            relationship_tasks.append((RelType.RELATIONSHIP_TO_SUBJECT, main.REL_TO_SUBJ_PROPS, attrs1.id, collected_theme_ids))
+            relationship_tasks.append((RelType.RELATIONSHIP_TO_SUBJECT, main.REL_TO_SUBJ_PROPS, attrs1.id, collected_class_ids))
+        else:
+            main.log_unknown_schema_type(1, level1.tag)
+    return ns, dictAttrs
+
+def plan_signature(main, dictAttrs, tasks, relationship_tasks):
+    """
+    Hash über den Plan, unabhängig von den zufälligen IDs (IDs werden durch Namen ersetzt).
+    """
+    names = {dictAttrs.id: "dictionary"}
+    for task in tasks:
+        names[task.id] = f"{task.entity_type.name}:{task.name}"
+    digest = hashlib.sha256()
+    for task in tasks:
+        digest.update(names[task.id].encode("utf-8"))
+    for rel_type, props, from_id, to_ids in main.optimize_relationship_tasks(relationship_tasks):
+        line = [rel_type.value, json.dumps(props, sort_keys=True), names.get(from_id), sorted(names.get(i) for i in to_ids)]
+        digest.update(json.dumps(line).encode("utf-8"))
+    return digest.hexdigest()
+
+def run_mode(mode, file_path):
+    """
+    Läuft im Kindprozess: liest die Datei mit der gewählten Variante und misst Zeit und RSS.
+    """
+    os.chdir(tempfile.mkdtemp())  # main.py legt beim Import logfile.txt an
+    import main
+    logging.disable(logging.INFO)
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    tasks = []
+    relationship_tasks = []
+    start = time.perf_counter()
+    if mode == "tree":
+        ns, dictAttrs = parse_feature_catalogue_tree(main, file_path, tasks, relationship_tasks)
+    else:
+        ns, dictAttrs = main.parse_feature_catalogue(file_path, tasks, relationship_tasks)
+    duration = time.perf_counter() - start
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    print(json.dumps({
+        "mode": mode,
+        "seconds": duration,
+        "peak_rss_mb": rss_after / 1024,
+        "parse_rss_mb": (rss_after - rss_before) / 1024,
+        "entities": len(tasks),
+        "relationships": len(relationship_tasks),
+        "signature": plan_signature(main, dictAttrs, tasks, relationship_tasks),
+    }))
+
+def run_benchmark(file_path, modes=("tree", "stream")):
+    results = []
+    for mode in modes:
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", mode, "--file", file_path],
+            check=True, capture_output=True, text=True
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark: Baum-Parser gegen strombasierten Parser")
+    parser.add_argument("--file", help="Vorhandener Katalog; ohne Angabe wird ein synthetischer erzeugt")
+    parser.add_argument("--size-mb", type=float, default=300, help="Größe des synthetischen Katalogs")
+    parser.add_argument("--child", choices=["tree", "stream"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_mode(args.child, args.file)
+        sys.exit(0)
+
+    file_path = args.file
+    if file_path is None:
+        from synthetic_catalogue import write_catalogue_of_size
+        file_path = os.path.join(tempfile.mkdtemp(), f"synthetic_{args.size_mb:g}mb.xml")
+        write_catalogue_of_size(file_path, args.size_mb)
+
+    size_mb = os.path.getsize(file_path) / 1024 / 1024
+    print(f"Datei: {file_path} ({size_mb:.1f} MB)")
+    results = run_benchmark(os.path.abspath(file_path))
+    for result in results:
+        print(f"{result['mode']:>6}: {result['seconds']:8.2f} s  Spitzen-RSS {result['peak_rss_mb']:8.1f} MB "
+              f"(Parse +{result['parse_rss_mb']:.1f} MB)  Entities {result['entities']}  Relationen {result['relationships']}")
+    if len({result["signature"] for result in results}) != 1:
+        print("WARNUNG: Die Varianten liefern unterschiedliche Pläne")
+        sys.exit(1)
+    print("Beide Varianten liefern denselben Plan")
@@ -0,0 +1,70 @@
+"""
+Prüft den Vorabgleich (--prefetch, --sync) gegen den lokalen DataCat-Ersatz
+(mock_datacat.py): Ein synthetischer Katalog wird einmal importiert und danach mit
+--deterministic-ids --prefetch sowie mit --sync erneut eingelesen. Die Wiederholungen
+dürfen keine Einträge oder Beziehungen mehr anlegen und am Serverbestand nichts ändern.
+
+Aufruf:
+    python benchmarks/check_prefetch.py --size-mb 0.5
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from mock_datacat import MockDataCat
+from synthetic_catalogue import write_catalogue_of_size
+
+CREATE_OPERATIONS = ("createCatalogEntry", "createRelationship")
+
+def run_main(server, file_path, work_dir, import_args):
+    env = dict(os.environ)
+    env.update({"DATACAT_URL": server.url, "DATACAT_USERNAME": "check", "DATACAT_PASSWORD": "check"})
+    journal = os.path.join(work_dir, "import_journal.sqlite")
+    if os.path.exists(journal):
+        os.remove(journal)
+    command = [sys.executable, os.path.join(REPO_DIR, "main.py"), "--file", file_path, "--journal", journal,
+               "--deterministic-ids", *import_args]
+    return subprocess.run(command, cwd=work_dir, env=env, stdout=subprocess.DEVNULL,
+                          stderr=subprocess.DEVNULL).returncode
+
+def creates(stats):
+    return {operation: stats["operations"].get(operation, 0) for operation in CREATE_OPERATIONS}
+
+def check(size_mb):
+    work_dir = tempfile.mkdtemp(prefix="check_prefetch_")
+    file_path = write_catalogue_of_size(os.path.join(work_dir, "synthetic.xml"), size_mb)
+    failures = []
+    with MockDataCat() as server:
+        if run_main(server, file_path, work_dir, []) != 0:
+            return [f"Erstimport fehlgeschlagen (Log: {work_dir})"]
+        baseline = server.stats()
+        for import_args in (["--prefetch"], ["--sync"]):
+            returncode = run_main(server, file_path, work_dir, import_args)
+            stats = server.stats()
+            name = " ".join(import_args)
+            if returncode != 0:
+                failures.append(f"{name}: Exit-Code {returncode}")
+            if creates(stats) != creates(baseline):
+                failures.append(f"{name}: erneut angelegt {creates(stats)} statt {creates(baseline)}")
+            for key in ("entries", "relationship_targets"):
+                if stats[key] != baseline[key]:
+                    failures.append(f"{name}: {key} {stats[key]} statt {baseline[key]}")
+            baseline = stats
+        print(f"Einträge: {baseline['entries']}, Beziehungsziele: {baseline['relationship_targets']}")
+    return failures
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prüft --prefetch und --sync gegen den lokalen DataCat-Ersatz")
+    parser.add_argument("--size-mb", type=float, default=0.5, help="Kataloggröße in MB")
+    args = parser.parse_args()
+    failures = check(args.size_mb)
+    for failure in failures:
+        print(failure)
+    print("OK" if not failures else f"{len(failures)} Fehler")
+    sys.exit(1 if failures else 0)
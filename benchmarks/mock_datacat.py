@@ -0,0 +1,345 @@
+"""
+Lokaler Ersatz für den DataCat-GraphQL-Server, um den Import ohne Netzwerk und ohne
+DataCat-Instanz zu messen.
+
+Unterstützt werden die Operationen des Importers (login, getTag, createTag,
+createCatalogEntry, addTag, createRelationship, search sowie für den Abgleich
+updateCatalogEntry, deleteCatalogEntry, deleteRelationship), auch gebündelt über Aliase.
+Nachgebildet werden:
+- Latenz je Request (latency, Sekunden)
+- Sperren je Entity: Eine Beziehung sperrt from_id und alle to_ids bis zum Ende des
+  Requests; gleichzeitige Requests auf dieselbe Entity erhalten "Could not acquire lock"
+- zufällige Lock-Konflikte je Beziehung (lock_rate) und HTTP 503 je Request (error_rate)
+- begrenzte Serverkapazität (capacity parallele Requests, darüber Warteschlange, ab der
+  vierfachen Kapazität HTTP 503)
+- ablaufende Tokens (token_expiry: neues Token nach so vielen Requests, danach HTTP 401)
+
+Aufruf:
+    python benchmarks/mock_datacat.py --port 8765 --latency 0.02 --lock-rate 0.01
+"""
+import argparse
+import gzip
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIELD = re.compile(
+    r"(?:(\w+)\s*:\s*)?\b(login|getTag|createTag|createCatalogEntry|createRelationship|addTag|search"
+    r"|updateCatalogEntry|deleteCatalogEntry|deleteRelationship)\s*\(([^)]*)\)"
+)
+VARIABLE = re.compile(r"\$(\w+)")
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+class MockDataCat:
+    """
+    Ersatzserver in einem Hintergrund-Thread.
+
+    Verwendung:
+        with MockDataCat(latency=0.02) as server:
+            os.environ["DATACAT_URL"] = server.url
+            ...
+            print(server.stats())
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, error_rate=0.0, lock_rate=0.0, capacity=0,
+                 token_expiry=0, seed=None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.lock_rate = lock_rate
+        self.capacity = capacity
+        self.token_expiry = token_expiry
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.workers = threading.Semaphore(capacity or 1)
+        self.active = 0
+        self.locked = set()  # aktuell gesperrte Entity-IDs
+        self.entries = {}
+        self.relationships = []
+        self.tags = {}
+        self.token = "token-0"
+        self.served = 0
+        self.operations = {}
+        self.responses = {}  # HTTP-Status -> Anzahl
+        self.lock_conflicts = 0
+        self.latencies = []
+        self.received_bytes = 0
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def _handler_class(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                start = time.perf_counter()
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                if self.headers.get("Content-Encoding") == "gzip":
+                    body = gzip.decompress(body)
+                status, result = mock.handle(json.loads(body), self.headers.get("Authorization"), len(body))
+                payload = json.dumps(result).encode() if result is not None else b""
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+                with mock.lock:
+                    mock.latencies.append(time.perf_counter() - start)
+
+            def do_GET(self):
+                payload = json.dumps(mock.stats()).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        return Handler
+
+    def _count_response(self, status):
+        with self.lock:
+            self.responses[status] = self.responses.get(status, 0) + 1
+
+    def handle(self, request, authorization, size):
+        """
+        Bearbeitet einen GraphQL-Request. Liefert (HTTP-Status, Antwort oder None).
+        """
+        query = request["query"]
+        variables = request.get("variables") or {}
+        is_login = "login(" in query
+        with self.lock:
+            self.served += 1
+            self.received_bytes += size
+            if self.token_expiry and self.served % self.token_expiry == 0:
+                self.token = f"token-{self.served}"
+            token = self.token
+        if not is_login and authorization != f"Bearer {token}":
+            self._count_response(401)
+            return 401, None
+        if not is_login and self.random.random() < self.error_rate:
+            self._count_response(503)
+            return 503, None
+
+        if self.capacity:
+            with self.lock:
+                self.active += 1
+                overloaded = self.active > 4 * self.capacity
+                if overloaded:
+                    self.active -= 1
+            if overloaded:
+                self._count_response(503)
+                return 503, None
+            self.workers.acquire()
+
+        data = {}
+        errors = []
+        held = set()
+        try:
+            self._execute(query, variables, data, errors, held)
+            time.sleep(self.latency)
+        finally:
+            with self.lock:
+                self.locked -= held
+            if self.capacity:
+                self.workers.release()
+                with self.lock:
+                    self.active -= 1
+        self._count_response(200)
+        result = {"data": data}
+        if errors:
+            result["errors"] = errors
+        return 200, result
+
+    def _execute(self, query, variables, data, errors, held):
+        with self.lock:
+            for alias, field, arguments in FIELD.findall(query):
+                key = alias or field
+                self.operations[field] = self.operations.get(field, 0) + 1
+                match = VARIABLE.search(arguments)
+                value = variables.get(match.group(1)) if match else None
+                if field == "login":
+                    data[key] = self.token
+                elif field == "getTag":
+                    data[key] = self.tags.get(value)
+                elif field == "createTag":
+                    self.tags[value["tagId"]] = {"id": value["tagId"], "name": value["name"]}
+                    data[key] = {"tag": self.tags[value["tagId"]]}
+                elif field == "createCatalogEntry":
+                    entry_id = value["properties"]["id"]
+                    if entry_id in self.entries:
+                        errors.append({"message": f"Entry {entry_id} already exists", "path": [key]})
+                        data[key] = None
+                    else:
+                        self.entries[entry_id] = value
+                        data[key] = {"catalogEntry": {"__typename": value["catalogEntryType"]}}
+                elif field == "addTag":
+                    entry = self.entries.get(value["catalogEntryId"])
+                    if entry is None:
+                        errors.append({"message": f"Entry {value['catalogEntryId']} not found", "path": [key]})
+                        data[key] = None
+                    else:
+                        if value["tagId"] not in entry["tags"]:
+                            entry["tags"] = [*entry["tags"], value["tagId"]]
+                        data[key] = {"catalogEntry": {"__typename": entry["catalogEntryType"]}}
+                elif field == "createRelationship":
+                    keys = {value["fromId"], *value["toIds"]} - held
+                    if keys & self.locked or self.random.random() < self.lock_rate:
+                        self.lock_conflicts += 1
+                        errors.append({"message": "Could not acquire lock", "path": [key]})
+                        data[key] = None
+                        continue
+                    self.locked |= keys
+                    held |= keys
+                    self.relationships.append(value)
+                    data[key] = {"catalogEntry": {"__typename": "Relationship"}}
+                elif field == "updateCatalogEntry":
+                    entry = self.entries.get(value["catalogEntryId"])
+                    if entry is None:
+                        errors.append({"message": f"Entry {value['catalogEntryId']} not found", "path": [key]})
+                        data[key] = None
+                    else:
+                        entry["properties"] = {**value["properties"], "id": value["catalogEntryId"]}
+                        data[key] = {"catalogEntry": {"__typename": entry["catalogEntryType"]}}
+                elif field == "deleteCatalogEntry":
+                    entry = self.entries.pop(value["catalogEntryId"], None)
+                    if entry is None:
+                        errors.append({"message": f"Entry {value['catalogEntryId']} not found", "path": [key]})
+                        data[key] = None
+                    else:
+                        self._remove_targets(lambda relationship: relationship["fromId"] == value["catalogEntryId"],
+                                             {value["catalogEntryId"]})
+                        data[key] = {"catalogEntry": {"__typename": entry["catalogEntryType"]}}
+                elif field == "deleteRelationship":
+                    self._remove_targets(
+                        lambda relationship: relationship["relationshipType"] == value["relationshipType"]
+                        and relationship["fromId"] == value["fromId"],
+                        set(value["toIds"]), scope_only=True)
+                    data[key] = {"catalogEntry": {"__typename": "Relationship"}}
+                elif field == "search":
+                    data[key] = self._search(value, variables.get("pageSize", 100), variables.get("pageNumber", 0))
+
+    def _remove_targets(self, drop, to_ids, scope_only=False):
+        """
+        Entfernt Beziehungen, für die drop zutrifft, und die Ziele to_ids (bei scope_only nur
+        aus diesen Beziehungen). Beziehungen ohne Ziele entfallen.
+        """
+        remaining = []
+        for relationship in self.relationships:
+            dropped = drop(relationship)
+            if dropped and not scope_only:
+                continue
+            if (dropped or not scope_only) and not to_ids.isdisjoint(relationship["toIds"]):
+                relationship = {**relationship, "toIds": [id for id in relationship["toIds"] if id not in to_ids]}
+                if not relationship["toIds"]:
+                    continue
+            remaining.append(relationship)
+        self.relationships = remaining
+
+    def _search(self, search_input, page_size, page_number):
+        tagged = set(search_input.get("tagged") or ())
+        matching = [entry for entry in self.entries.values() if tagged & set(entry["tags"])]
+        outgoing = {}
+        for relationship in self.relationships:
+            outgoing.setdefault(relationship["fromId"], []).append(relationship)
+        nodes = []
+        for entry in matching[page_number * page_size:(page_number + 1) * page_size]:
+            entry_id = entry["properties"]["id"]
+            node = {
+                "id": entry_id,
+                "recordType": entry["catalogEntryType"],
+                "name": entry["properties"]["names"]["value"],
+                "description": (entry["properties"].get("descriptions") or {}).get("value"),
+            }
+            for relationship in outgoing.get(entry_id, ()):
+                rel_type = relationship["relationshipType"]
+                targets = [{"id": to_id} for to_id in relationship["toIds"]]
+                if rel_type == "Dictionary":
+                    node["dictionary"] = targets[0]
+                elif rel_type == "Properties":
+                    node.setdefault("properties", []).extend(targets)
+                elif rel_type == "RelationshipToSubject":
+                    node.setdefault("connectedSubjects", []).append({"targetSubjects": targets})
+                elif rel_type == "PossibleValues":
+                    node.setdefault("possibleValues", []).extend(targets)
+                elif rel_type == "Values":
+                    node.setdefault("values", []).extend({"orderedValue": target} for target in targets)
+            nodes.append(node)
+        return {
+            "nodes": nodes,
+            "pageInfo": {"hasNext": (page_number + 1) * page_size < len(matching)},
+            "totalElements": len(matching),
+        }
+
+    def stats(self):
+        with self.lock:
+            latencies = list(self.latencies)
+            relationship_targets = {
+                (relationship["relationshipType"], relationship["fromId"], to_id)
+                for relationship in self.relationships for to_id in relationship["toIds"]
+            }
+            return {
+                "requests": self.served,
+                "responses": {str(status): count for status, count in sorted(self.responses.items())},
+                "operations": dict(self.operations),
+                "lock_conflicts": self.lock_conflicts,
+                "received_bytes": self.received_bytes,
+                "latency_p50": percentile(latencies, 0.5),
+                "latency_p99": percentile(latencies, 0.99),
+                "entries": len(self.entries),
+                "relationships": len(self.relationships),
+                "relationship_targets": len(relationship_targets),
+            }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lokaler Ersatz für den DataCat-GraphQL-Server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Latenz je Request in Sekunden")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Anteil der Requests mit HTTP 503")
+    parser.add_argument("--lock-rate", type=float, default=0.0, help="Anteil der Beziehungen mit Lock-Konflikt")
+    parser.add_argument("--capacity", type=int, default=0, help="Parallel bearbeitete Requests (0 = unbegrenzt)")
+    parser.add_argument("--token-expiry", type=int, default=0, help="Neues Token nach so vielen Requests (0 = nie)")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    server = MockDataCat(args.host, args.port, args.latency, args.error_rate, args.lock_rate, args.capacity,
+                         args.token_expiry, args.seed)
+    print(f"DataCat-Ersatz läuft auf {server.url} (Statistik per GET)")
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
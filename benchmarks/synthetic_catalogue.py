@@ -0,0 +1,112 @@
+"""
+Erzeugt synthetische FeatureCatalogue-Dateien im Aufbau von GeoInfoDok (aaa.xml).
+
+Die Datei wird strombasiert geschrieben, so dass auch Kataloge mit mehreren
+hundert MB ohne großen Speicherbedarf entstehen.
+
+Aufruf:
+    python benchmarks/synthetic_catalogue.py out.xml --size-mb 300
+"""
+import argparse
+import os
+import random
+from xml.sax.saxutils import escape
+
+AC_NAMESPACE = "http://www.adv-online.de/namespaces/adv/gid/ac/7.1"
+GML_NAMESPACE = "http://www.opengis.net/gml/3.2"
+
+VALUE_TYPES = ["CharacterString", "Integer", "Boolean", "Real", "Length", "Area", "Date", "URI"]
+SHARED_VALUES = ["ja", "nein", "unbekannt", "sonstiges"]
+
+# Ungefähre Größe einer Objektart in Bytes bei den Standardparametern
+BYTES_PER_FEATURE_TYPE = 16000
+
+def header(tag, identifier, description, gml_id):
+    parts = [f'<{tag} gml:id="{gml_id}">']
+    if description is not None:
+        parts.append(f"<gml:description>{escape(description)}</gml:description>")
+    parts.append(f'<gml:identifier codeSpace="http://www.adv-online.de/">{escape(identifier)}</gml:identifier>')
+    parts.append(f"<gml:name>{escape(identifier)}</gml:name>")
+    return "".join(parts)
+
+def write_feature_type(out, rnd, tag, name, attributes_per_type, values_per_list):
+    out.write("<gml:dictionaryEntry>")
+    out.write(header(tag, name, f"Beschreibung der Objektart {name}", f"ID_{name}"))
+    for a in range(attributes_per_type):
+        attribute = f"{name.lower()}_attr{a}"
+        role = rnd.random() < 0.1
+        out.write("<gml:dictionaryEntry>")
+        out.write(header("AC_AssociationRole" if role else "AC_FeatureAttribute", f"attr{a % 12}",
+                         f"Attribut {a % 12} der Objektart {name}", f"ID_{attribute}"))
+        if rnd.random() < 0.4:
+            # Attribut mit Werteliste (Codeliste)
+            out.write(f"<valueTypeName>AX_Werteliste_{a % 25}</valueTypeName>")
+            for v in range(values_per_list):
+                value = SHARED_VALUES[v] if v < len(SHARED_VALUES) and rnd.random() < 0.5 else f"Wert_{a % 25}_{v}"
+                out.write("<gml:dictionaryEntry>")
+                out.write(header("AC_ListedValue", value, f"Bedeutung von {value}", f"ID_{attribute}_{v}"))
+                out.write(f"<code>{1000 + v}</code></AC_ListedValue></gml:dictionaryEntry>")
+        else:
+            out.write(f"<valueTypeName>{rnd.choice(VALUE_TYPES)}</valueTypeName>")
+        out.write(f"<cardinality>0..1</cardinality></{'AC_AssociationRole' if role else 'AC_FeatureAttribute'}>")
+        out.write("</gml:dictionaryEntry>")
+    if rnd.random() < 0.05:
+        # Unbekannter Eintrag innerhalb einer Objektart
+        out.write(f'<gml:dictionaryEntry><AC_FeatureOperation gml:id="OP_{name}"><gml:identifier>op</gml:identifier>'
+                  f"</AC_FeatureOperation></gml:dictionaryEntry>")
+    out.write(f"</{tag}></gml:dictionaryEntry>")
+
+def write_catalogue(path, feature_types, groups_per_area=8, types_per_group=25, attributes_per_type=12,
+                    values_per_list=8, seed=42):
+    """
+    Schreibt einen Katalog mit etwa feature_types Objektarten nach path.
+    """
+    rnd = random.Random(seed)
+    types_per_area = groups_per_area * types_per_group
+    areas = max(1, -(-feature_types // types_per_area))
+    written = 0
+    with open(path, "w", encoding="utf-8") as out:
+        out.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        out.write(f'<AC_FeatureCatalogue xmlns="{AC_NAMESPACE}" xmlns:gml="{GML_NAMESPACE}" gml:id="Katalog">')
+        out.write("<gml:description>Synthetischer Objektartenkatalog</gml:description>")
+        out.write("<gml:identifier>AAA-Synthetisch</gml:identifier><gml:name>AAA</gml:name>")
+        for area in range(areas):
+            out.write("<gml:dictionaryEntry>")
+            out.write(header("AC_Objektartenbereich", f"Bereich_{area}", f"Objektartenbereich {area}", f"B{area}"))
+            for group in range(groups_per_area):
+                if written >= feature_types:
+                    break
+                out.write("<gml:dictionaryEntry>")
+                out.write(header("AC_Objektartengruppe", f"Gruppe_{area}_{group}", f"Objektartengruppe {group}",
+                                 f"G{area}_{group}"))
+                for _ in range(types_per_group):
+                    if written >= feature_types:
+                        break
+                    tag = "AC_DataType" if rnd.random() < 0.15 else "AC_FeatureType"
+                    write_feature_type(out, rnd, tag, f"AX_Objektart_{written}", attributes_per_type, values_per_list)
+                    written += 1
+                out.write("</AC_Objektartengruppe></gml:dictionaryEntry>")
+            # Objektart direkt im Bereich sowie ein unbekannter Eintrag
+            write_feature_type(out, rnd, "AC_FeatureType", f"AX_Bereichsobjekt_{area}", attributes_per_type, values_per_list)
+            out.write(f'<gml:dictionaryEntry><AC_Abbildungsregel gml:id="R{area}"><gml:identifier>Regel_{area}'
+                      f"</gml:identifier></AC_Abbildungsregel></gml:dictionaryEntry>")
+            out.write("</AC_Objektartenbereich></gml:dictionaryEntry>")
+        out.write("</AC_FeatureCatalogue>\n")
+    return path
+
+def write_catalogue_of_size(path, size_mb, **kwargs):
+    """
+    Schreibt einen Katalog mit einer Dateigröße von ungefähr size_mb Megabyte.
+    """
+    feature_types = max(1, int(size_mb * 1024 * 1024 / BYTES_PER_FEATURE_TYPE))
+    write_catalogue(path, feature_types, **kwargs)
+    return path
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Erzeugt einen synthetischen GeoInfoDok-FeatureCatalogue.")
+    parser.add_argument("output", help="Zieldatei")
+    parser.add_argument("--size-mb", type=float, default=10, help="Ungefähre Dateigröße in MB")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    write_catalogue_of_size(args.output, args.size_mb, seed=args.seed)
+    print(f"{args.output}: {os.path.getsize(args.output) / 1024 / 1024:.1f} MB")
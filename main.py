@@ -1,25 +1,40 @@
-import random
+import argparse
+import asyncio
+import contextvars
+import hashlib
 import xml.etree.ElementTree as ET
 import uuid
 import logging
+from collections import Counter
 from enum import Enum
+from contextlib import contextmanager
+from functools import lru_cache, partial
 import time
 import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from GraphQLRequests import (add_tag, create_catalog_entry, create_relationship, create_tag,
-    get_tag, login)
-
-# Logfile zu Beginn leeren
-open("logfile.txt", "w").close()
-
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s %(levelname)s %(message)s",
-    handlers=[
-        logging.StreamHandler(),  # Konsole
-        logging.FileHandler("logfile.txt", encoding="utf-8")  # Datei
-    ]
-)
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from AdaptiveConcurrency import AdaptiveLimiter
+from AsyncGraphQLRequests import AsyncGraphQLClient
+from CatalogSync import CatalogState, diff_plan
+from GraphQLRequests import ALREADY_EXISTS, create_tag, find_tagged_entries, get_tag, load_config, login
+from ImportJournal import ImportJournal
+import ImportLogging
+import ParseCache
+import PlanModel
+from ImportLogging import log_counts, phase_logger, setup_logging, worker_logging
+from ImportMetrics import metrics
+from ImportPlan import PlanWriter, default_plan_path, iter_plan, read_plan_header, source_digest
+from ImportPipeline import DependencyTracker, ThreadSafeSink
+from ParseCache import load_parse_cache, write_parse_cache
+from PlanModel import PlannedEntity, entity_key, entity_uuid
+from RelationshipScheduler import RelationshipScheduler
+from RetryPolicy import RequestFailed
+
+# Logger je Phase; eingerichtet wird das Logging von der Kommandozeile (setup_logging) oder der Anwendung
+parse_log = phase_logger("parse")
+entity_log = phase_logger("entities")
+relationship_log = phase_logger("relationships")
+sync_log = phase_logger("sync")
 
 class EntityType(Enum):
     DICTIONARY = ("Dictionary", "Dictionary", "c1c7016b-f85c-43c7-a696-71e75555062b")
@@ -54,6 +69,93 @@ class XmlTag(Enum):
     def tag(self, ns):
         return f"{{{ns[self.value[0]]}}}{self.value[1]}"
 
+def resolve_tags(ns):
+    """
+    Löst alle XmlTags einmalig für die Namespaces der Datei auf.
+    """
+    return {xml_tag: xml_tag.tag(ns) for xml_tag in XmlTag}
+
+class ImportState:
+    """
+    Zustand eines einzelnen Imports. Die Funktionen dieses Moduls arbeiten auf dem
+    aktuellen Zustand state; DataCatImporter setzt für jeden Import einen neuen ein
+    (use_state, nur im Kontext dieses Imports sichtbar), die Kommandozeile verwendet den
+    Standardzustand.
+    """
+
+    def __init__(self, id_tag=None, max_to_ids=None, link_batch_size=250, journal=None):
+        # Lookup-Tabellen für Entities und Relationen
+        self.entity_lookup = {}  # entity_key(name, typ, description) -> id
+        self.relation_lookup = set()  # (relationship_type, from_id, [to_ids])
+
+        # Import-Journal für --resume (None = kein Journal)
+        self.journal = journal
+
+        # Höchstzahl von toIds je createRelationship (DATACAT_MAX_TO_IDS, None = unbegrenzt)
+        self.max_to_ids = max_to_ids
+
+        # Dictionary-Beziehungen je Request (DATACAT_LINK_BATCH_SIZE)
+        self.link_batch_size = link_batch_size
+
+        # Entities, deren Anlage fehlschlug, je tagId; add_tag wird gebündelt am Ende der Entity-Phase versucht
+        self.tag_fallbacks = {}
+
+        # Tag, aus dem mit --deterministic-ids die Entity-IDs abgeleitet werden (None = zufällige IDs)
+        self.id_tag = id_tag
+
+        # Vorab vom Server geladene Einträge und Relationen (--prefetch) und eingesparte Aufrufe
+        self.prefetched_ids = set()
+        self.prefetched_relations = set()
+        self.avoided_calls = Counter()
+
+# Zustand des laufenden Imports je Kontext (asyncio-Task bzw. mit contextvars.copy_context
+# gestarteter Thread); ohne use_state gilt der Standardzustand
+_default_state = ImportState()
+_current_state = contextvars.ContextVar("import_state")
+
+class _CurrentState:
+    """
+    Verweist auf den ImportState des aktuellen Kontexts (Lesen und Setzen von Attributen).
+    """
+
+    def __getattr__(self, name):
+        return getattr(_current_state.get(_default_state), name)
+
+    def __setattr__(self, name, value):
+        setattr(_current_state.get(_default_state), name, value)
+
+state = _CurrentState()
+
+def current_state():
+    """
+    ImportState des aktuellen Kontexts, für Funktionen, die state häufig verwenden.
+    """
+    return _current_state.get(_default_state)
+
+@contextmanager
+def use_state(import_state):
+    """
+    Setzt import_state für die Dauer des Blocks im aktuellen Kontext ein.
+    """
+    token = _current_state.set(import_state)
+    try:
+        yield import_state
+    finally:
+        _current_state.reset(token)
+
+# Höchstzahl eingereichter, noch nicht gestarteter Beziehungen beim apply
+APPLY_RELATIONSHIP_WINDOW = 20000
+
+# Properties der Beziehungen sind geteilte Konstanten (werden nie verändert)
+REL_TO_SUBJ_PROPS = {"relationshipToSubjectProperties": {"relationshipType": "XTD_SCHEMA_LEVEL"}}
+
+@lru_cache(maxsize=None)
+def value_order_props(order):
+    """
+    Properties einer Values-Beziehung an Position order, eine Instanz je Position.
+    """
+    return {"valueListProperties": {"order": order}}
+
 def find_datatype(attribute, ns):
     name = getattr(attribute.find("valueTypeName", ns), "text", None)
     if name in ("CharacterString", "URI"):
@@ -69,372 +171,1275 @@ def find_datatype(attribute, ns):
     else:
         return None
 
+def new_entity_id(name, type_name, description):
+    """
+    ID für eine neue Entity: mit --deterministic-ids aus Tag, Name, Typ und Beschreibung
+    abgeleitet, sodass wiederholte Importe dieselben IDs vergeben, sonst zufällig.
+    """
+    id_tag = current_state().id_tag
+    if id_tag is None:
+        return str(uuid.uuid4())
+    return entity_uuid(id_tag, name, type_name, description)
+
+def count_prefetched_entity(entity_id):
+    # Jede vorab geladene Entity zählt nur einmal als eingesparte Anlage
+    import_state = current_state()
+    if entity_id in import_state.prefetched_ids:
+        import_state.prefetched_ids.discard(entity_id)
+        import_state.avoided_calls["entities"] += 1
+
 def prepare_entity_attributes(domain, entity_type, ns):
     name = getattr(domain.find("gml:identifier", ns), "text", None)
     description = getattr(domain.find("gml:description", ns), "text", None)
-    id = getattr(domain.find("gml:name", ns), "text", None)
     
     # Erweiterten Lookup-Key mit description erstellen
-    lookup_key = (name, entity_type.value[1], description)
+    lookup_key = entity_key(name, entity_type.value[1], description)
+    entity_lookup = current_state().entity_lookup
     
     # Prüfen, ob Entity bereits existiert
-    if lookup_key in entity_lookup:
-        existing_id = entity_lookup[lookup_key]
-        return {
-            "id": existing_id,
-            "properties": None,  # Keine Properties, da bereits vorhanden
-            "entityType": entity_type,
-            "is_new": False
-        }
+    existing_id = entity_lookup.get(lookup_key)
+    if existing_id is not None:
+        count_prefetched_entity(existing_id)
+        # Keine Properties, da bereits vorhanden
+        return PlannedEntity(existing_id, entity_type, is_new=False)
     
     # Entity noch nicht vorhanden, neue erstellen
-    properties = {"names": {"languageTag": "de", "value": name}}
-    if description is not None:
-        properties["descriptions"] = {"languageTag": "de", "value": description}
-    # if id is not None:
-        # properties["id"] = id + "_" + name.replace(" ", "_").replace("'", '"')
-    # else:
-    #     properties["id"] = str(uuid.uuid4())
-    properties["id"] = str(uuid.uuid4())
+    datatype = None
     if entity_type.value[1] == EntityType.MERKMAL.value[1]:
         datatype = find_datatype(domain, ns)
-        if datatype:
-            properties["propertyProperties"] = {"dataType": datatype}
+    attributes = PlannedEntity(new_entity_id(name, entity_type.value[1], description), entity_type, name, description, datatype)
     
     # In die Lookup-Tabelle eintragen
-    entity_lookup[lookup_key] = properties["id"]
-    return {
-        "id": properties["id"],
-        "properties": properties,
-        "entityType": entity_type,
-        "is_new": True
-    }
+    entity_lookup[lookup_key] = attributes.id
+    return attributes
+
+def record_entity(attributes):
+    if state.journal is not None:
+        state.journal.record_entity((attributes.name, attributes.type_name, attributes.description), attributes.id)
 
-def create_entry(attributes, token, tagId):
-    properties = attributes["properties"]
-    entityType = attributes["entityType"]
+def commit_journal():
+    # Nach jedem bestätigten Request festschreiben, sonst legt --resume nach einem Abbruch doppelt an
+    if state.journal is not None:
+        state.journal.commit()
+
+def catalog_entry_args(attributes, tagId):
+    """
+    Baut die Argumente für create_catalog_entries erst beim Senden.
+    """
+    entityType = attributes.entity_type
+    return (entityType.value[1], attributes.properties(), [entityType.value[2], tagId])
+
+async def add_tag_with_retry(client, attributes, tagId):
+    # Wiederholungen bei Lock-Konflikten und Serverfehlern übernimmt die RetryPolicy des Clients
+    addTag = await client.add_tag(attributes.id, tagId)
+    if addTag is not None:
+        entity_log.info("Tag für '%s' erfolgreich hinzugefügt", attributes.name)
+        if state.journal is not None:
+            state.journal.record_tag(attributes.id, tagId)
+        return addTag
+
+    error_msg = f"add_tag fehlgeschlagen für Entity {attributes.name} (ID: {attributes.id})"
+    entity_log.error(error_msg)
+    raise Exception(error_msg)
+
+def count_existing_entity(attributes):
+    # Entity mit derselben ID (samt Tag) existiert bereits und gilt als angelegt
+    state.avoided_calls["existing_entities"] += 1
+    metrics.inc("entities_already_existing_total")
+    entity_log.debug("'%s' existiert bereits (ID: %s)", attributes.name, attributes.id)
+
+async def create_entry(client, attributes, tagId):
     try:
-        result = create_catalog_entry(token, entityType.value[1], properties, [entityType.value[2], tagId])
-        if result is None:
-            # Retry-Logik für add_tag
-            max_retries = 5
-            addTag = None
-            
-            for attempt in range(1, max_retries + 1):
-                addTag = add_tag(token, properties["id"], tagId)
-                if addTag is not None:
-                    logging.info(f"Tag für '{properties['names']['value']}' erfolgreich hinzugefügt nach Versuch {attempt}")
-                    break
-                
-                if attempt < max_retries:
-                    wait_time = attempt * 0.5  # Progressiv längere Wartezeit
-                    time.sleep(wait_time)
-                else:
-                    # Alle Versuche fehlgeschlagen
-                    error_msg = f"add_tag fehlgeschlagen nach {max_retries} Versuchen für Entity {properties['names']['value']} (ID: {properties['id']})"
-                    logging.error(error_msg)
-                    raise Exception(error_msg)
+        result = (await client.create_catalog_entries([catalog_entry_args(attributes, tagId)]))[0]
+        if result is ALREADY_EXISTS:
+            count_existing_entity(attributes)
+        elif result is None:
+            await add_tag_with_retry(client, attributes, tagId)
+        record_entity(attributes)
+        commit_journal()
         
-        if entityType == EntityType.DICTIONARY:
+        if attributes.entity_type == EntityType.DICTIONARY:
             return None  # Keine ID für Dictionary
-        return properties["id"]
+        return attributes.id
     except Exception as e:
-        logging.error(f"Fehler in create_entry: {e}, EntityType: {entityType}, Properties: {properties}")
+        entity_log.error("Fehler in create_entry: %s, Entity: %s", e, attributes)
         raise
 
-def process_feature_type(level, collected_class_ids, tasks, relationship_tasks, ns, log_index):
+async def create_entries(client, batch, tagId):
+    """
+    Legt einen Batch von Entities mit einem einzigen Request an. Bereits vorhandene IDs
+    gelten als angelegt, die übrigen fehlgeschlagenen Einträge werden für den
+    add_tag-Fallback (apply_tag_fallbacks) gesammelt. Liefert die IDs der erfolgreich
+    angelegten Entities (im Pipeline-Modus einschließlich des Dictionary).
+    """
+    results = await client.create_catalog_entries([catalog_entry_args(attrs, tagId) for attrs in batch])
+    ids = []
+    for attrs, result in zip(batch, results):
+        if result is ALREADY_EXISTS:
+            count_existing_entity(attrs)
+        elif result is None:
+            state.tag_fallbacks.setdefault(tagId, []).append(attrs)
+            continue
+        record_entity(attrs)
+        ids.append(attrs.id)
+    commit_journal()
+    return ids
+
+async def apply_tag_fallbacks(client, tagId, batch_size):
+    """
+    Versieht die gesammelten Entities, deren Anlage fehlschlug (z.B. weil sie ohne das
+    Import-Tag bereits existieren), gebündelt mit dem Tag. Liefert die IDs der
+    erfolgreich getaggten Entities.
+    """
+    fallbacks = state.tag_fallbacks.pop(tagId, None)
+    if not fallbacks:
+        return []
+    batches = chunked(fallbacks, batch_size)
+    results = await asyncio.gather(
+        *(client.add_tags([(attrs.id, tagId) for attrs in batch]) for batch in batches), return_exceptions=True
+    )
+    ids = []
+    for batch, result in zip(batches, results):
+        if isinstance(result, Exception):
+            result = [False] * len(batch)
+        for attrs, tagged in zip(batch, result):
+            if not tagged:
+                entity_log.error("add_tag fehlgeschlagen für Entity %s (ID: %s)", attrs.name, attrs.id)
+                continue
+            entity_log.info("Tag für '%s' erfolgreich hinzugefügt", attrs.name)
+            if state.journal is not None:
+                state.journal.record_tag(attrs.id, tagId)
+            record_entity(attrs)
+            ids.append(attrs.id)
+    commit_journal()
+    logging.info(f"add_tag-Fallback: {len(ids)} von {len(fallbacks)} Entities getaggt")
+    return ids
+
+def process_feature_type(level, collected_class_ids, tasks, relationship_tasks, ns, log_index, tags=None):
+    if tags is None:
+        tags = resolve_tags(ns)
+    connector_tag = tags[XmlTag.CONNECTOR]
+    property_tags = (tags[XmlTag.FEATUREATTRIBUTE], tags[XmlTag.ASSOCIATIONROLE])
+    listed_value_tag = tags[XmlTag.LISTEDVALUE]
+    entity_lookup = current_state().entity_lookup
+
     attrs = prepare_entity_attributes(level, EntityType.KLASSE, ns)
-    if attrs.get("is_new", True):
+    if attrs.is_new:
         tasks.append(attrs)
-    collected_class_ids.append(attrs["id"])
+    collected_class_ids.append(attrs.id)
 
     collected_property_ids = []
-    for element in level.findall(XmlTag.CONNECTOR.tag(ns)):
+    for element in level.findall(connector_tag):
         sub_level = element[0]
-        if sub_level.tag == XmlTag.FEATUREATTRIBUTE.tag(ns) or sub_level.tag == XmlTag.ASSOCIATIONROLE.tag(ns):
+        if sub_level.tag in property_tags:
             prop_attrs = prepare_entity_attributes(sub_level, EntityType.MERKMAL, ns)
-            if prop_attrs.get("is_new", True):
+            if prop_attrs.is_new:
                 tasks.append(prop_attrs)
-            collected_property_ids.append(prop_attrs["id"])
+            collected_property_ids.append(prop_attrs.id)
 
             valList = False
             name = getattr(sub_level.find("valueTypeName", ns), "text", None)
             # Wertelisten haben keine description, daher None verwenden
-            value_list_lookup_key = (name, EntityType.WERTELISTE.value[1], None)
+            value_list_lookup_key = entity_key(name, EntityType.WERTELISTE.value[1], None)
             if name and value_list_lookup_key in entity_lookup:
                 valListId = entity_lookup[value_list_lookup_key]
+                count_prefetched_entity(valListId)
                 # Werteliste existiert, nur Relation anlegen nach der Schleife
                 skip_value_list_creation = True
             else:
-                valListId = str(uuid.uuid4())
+                # Ohne Namen wird keine Werteliste angelegt, eine abgeleitete ID wäre nicht eindeutig
+                valListId = new_entity_id(name, EntityType.WERTELISTE.value[1], None) if name else str(uuid.uuid4())
                 skip_value_list_creation = False
             order = 1
-            for sub_element in sub_level.findall(XmlTag.CONNECTOR.tag(ns)):
+            for sub_element in sub_level.findall(connector_tag):
                 val_level = sub_element[0]
-                if val_level.tag == XmlTag.LISTEDVALUE.tag(ns):
+                if val_level.tag == listed_value_tag:
                     valList = True
                     val_attrs = prepare_entity_attributes(val_level, EntityType.WERT, ns)
-                    if val_attrs.get("is_new", True):
+                    if val_attrs.is_new:
                         tasks.append(val_attrs)
-                    relationship_tasks.append((RelType.VALUES, {"valueListProperties": {"order": order}}, valListId, [val_attrs["id"]]))
+                    relationship_tasks.append((RelType.VALUES, value_order_props(order), valListId, [val_attrs.id]))
                     order += 1
                 else:
                     log_unknown_schema_type(5, val_level.tag)
             if valList:
                 if skip_value_list_creation:
                     # Werteliste existiert, nur Relation anlegen
-                    relationship_tasks.append((RelType.POSSIBLE_VALUES, None, prop_attrs["id"], [valListId]))
+                    relationship_tasks.append((RelType.POSSIBLE_VALUES, None, prop_attrs.id, [valListId]))
                 elif name:
-                    vAttrs = {
-                        "id": valListId,
-                        "properties": {
-                            "names": {"languageTag": "de", "value": name},
-                            "id": valListId,
-                            "valueListProperties": {"languageTag": "de"}
-                        },
-                        "entityType": EntityType.WERTELISTE,
-                        "is_new": True
-                    }
-                    tasks.append(vAttrs)
+                    tasks.append(PlannedEntity(valListId, EntityType.WERTELISTE, name))
                     entity_lookup[value_list_lookup_key] = valListId
-                    relationship_tasks.append((RelType.POSSIBLE_VALUES, None, prop_attrs["id"], [valListId]))
+                    relationship_tasks.append((RelType.POSSIBLE_VALUES, None, prop_attrs.id, [valListId]))
                 else:
-                    logging.info(f"Kein valueTypeName für Werteliste bei Merkmal {prop_attrs['properties']['names']['value']}")
+                    log_counts.count("Werteliste ohne valueTypeName")
+                    parse_log.debug("Kein valueTypeName für Werteliste bei Merkmal %s", prop_attrs.name)
         else:
             log_unknown_schema_type(log_index, sub_level.tag)
-    relationship_tasks.append((RelType.PROPERTIES, None, attrs["id"], collected_property_ids))
+    relationship_tasks.append((RelType.PROPERTIES, None, attrs.id, collected_property_ids))
 
-def log_unknown_schema_type(level, tag):
-    logging.info(f"Unbekannter Schema-Typ [{level}]: {tag}")
+def parse_feature_catalogue(file_path, tasks, relationship_tasks, on_dictionary=None):
+    """
+    Liest den FeatureCatalogue in einem einzigen Durchlauf per iterparse. Die Namespaces
+    werden dabei mitgelesen, jeder Teilbaum wird verarbeitet, sobald er vollständig ist,
+    und danach aus dem Baum entfernt. Der Speicherbedarf hängt so von der Tiefe des Baums
+    (und der Größe einer Objektart) ab, nicht von der Dateigröße.
+
+    Ebenen: FeatureCatalogue (0) > dictionaryEntry (1) > Objektartenbereich (2)
+    > dictionaryEntry (3) > Objektartengruppe/FeatureType (4) > dictionaryEntry (5) > FeatureType (6)
 
-def dict_to_hashable(obj):
+    tasks und relationship_tasks benötigen nur append. on_dictionary wird mit den
+    Dictionary-Attributen aufgerufen, sobald diese feststehen.
+
+    Liefert (ns, dictAttrs).
     """
-    Konvertiert ein Dictionary (auch verschachtelt) zu einem hashbaren Tupel.
+    ns = {}
+    tags = None
+    stack = []
+    dictAttrs = None
+    attrs1 = attrs2 = None
+    bereich_open = gruppe_open = False
+    collected_theme_ids = []
+    collected_class_ids = []
+
+    def open_bereich(level1):
+        nonlocal attrs1, bereich_open, collected_theme_ids, collected_class_ids
+        attrs1 = prepare_entity_attributes(level1, EntityType.THEMA, ns)
+        if attrs1.is_new:
+            tasks.append(attrs1)
+        collected_theme_ids = []
+        collected_class_ids = []
+        bereich_open = True
+
+    def open_gruppe(level2):
+        nonlocal attrs2, gruppe_open, collected_class_ids
+        attrs2 = prepare_entity_attributes(level2, EntityType.THEMA, ns)
+        if attrs2.is_new:
+            tasks.append(attrs2)
+        collected_theme_ids.append(attrs2.id)
+        collected_class_ids = []
+        gruppe_open = True
+
+    for event, elem in ET.iterparse(file_path, events=("start-ns", "start", "end")):
+        if event == "start-ns":
+            ns[elem[0] or ""] = elem[1]
+            continue
+
+        if event == "start":
+            depth = len(stack)
+            stack.append(elem)
+            if depth == 0:
+                tags = resolve_tags(ns)
+                connector_tag = tags[XmlTag.CONNECTOR]
+                bereich_tag = tags[XmlTag.OBJEKTARTENBEREICH]
+                gruppe_tag = tags[XmlTag.OBJEKTARTENGRUPPE]
+                feature_tags = (tags[XmlTag.FEATURETYPE], tags[XmlTag.DATATYPE])
+            elif depth == 2:
+                bereich_open = False
+            elif depth == 4:
+                gruppe_open = False
+            elif elem.tag == connector_tag:
+                # Attribute eines Containers sind vollständig, sobald sein erster Eintrag beginnt
+                if depth == 1 and dictAttrs is None:
+                    dictAttrs = prepare_entity_attributes(stack[0], EntityType.DICTIONARY, ns)
+                    if on_dictionary is not None:
+                        on_dictionary(dictAttrs)
+                elif depth == 3 and stack[2].tag == bereich_tag and not bereich_open:
+                    open_bereich(stack[2])
+                elif depth == 5 and stack[2].tag == bereich_tag and stack[4].tag == gruppe_tag and not gruppe_open:
+                    open_gruppe(stack[4])
+            continue
+
+        stack.pop()
+        depth = len(stack)
+        if depth == 0:
+            if dictAttrs is None:
+                dictAttrs = prepare_entity_attributes(elem, EntityType.DICTIONARY, ns)
+                if on_dictionary is not None:
+                    on_dictionary(dictAttrs)
+            continue
+        if depth > 5 or elem.tag != connector_tag:
+            continue
+
+        if depth == 5:
+            if stack[2].tag != bereich_tag or stack[4].tag != gruppe_tag:
+                continue  # Teil einer Objektart, wird mit dieser verarbeitet
+            if len(elem):
+                level3 = elem[0]
+                if level3.tag in feature_tags:
+                    process_feature_type(level3, collected_class_ids, tasks, relationship_tasks, ns, 4, tags)
+                else:
+                    log_unknown_schema_type(3, level3.tag)
+
+        elif depth == 3:
+            if stack[2].tag != bereich_tag:
+                continue  # Unbekannter Bereich, wird als Ganzes verworfen
+            if len(elem):
+                level2 = elem[0]
+                if level2.tag == gruppe_tag:
+                    if not gruppe_open:
+                        open_gruppe(level2)
+                elif level2.tag in feature_tags:
+                    process_feature_type(level2, collected_class_ids, tasks, relationship_tasks, ns, 3, tags)
+                else:
+                    log_unknown_schema_type(2, level2.tag)
+            if attrs2 is not None:
+                relationship_tasks.append((RelType.RELATIONSHIP_TO_SUBJECT, REL_TO_SUBJ_PROPS, attrs2.id, collected_class_ids))
+
+        elif depth == 1:
+            if len(elem):
+                level1 = elem[0]
+                if level1.tag == bereich_tag:
+                    if not bereich_open:
+                        open_bereich(level1)
+                    relationship_tasks.append((RelType.RELATIONSHIP_TO_SUBJECT, REL_TO_SUBJ_PROPS, attrs1.id, collected_theme_ids))
+                    relationship_tasks.append((RelType.RELATIONSHIP_TO_SUBJECT, REL_TO_SUBJ_PROPS, attrs1.id, collected_class_ids))
+                else:
+                    log_unknown_schema_type(1, level1.tag)
+
+        else:
+            continue
+
+        # Verarbeiteten Teilbaum freigeben
+        stack[-1].remove(elem)
+
+    return ns, dictAttrs
+
+@lru_cache(maxsize=None)
+def parser_version():
     """
-    if obj is None:
-        return None
-    elif isinstance(obj, dict):
-        return tuple(sorted((k, dict_to_hashable(v)) for k, v in obj.items()))
-    elif isinstance(obj, list):
-        return tuple(dict_to_hashable(item) for item in obj)
-    else:
-        return obj
+    Kennung des Parsers und des Zwischenmodells: Hash über main.py, PlanModel.py
+    (Lookup-Keys, IDs, PlannedEntity) und ParseCache.py (Speicherformat).
+    """
+    digests = "".join(source_digest(path) for path in (__file__, PlanModel.__file__, ParseCache.__file__))
+    return hashlib.sha256(digests.encode("ascii")).hexdigest()[:16]
 
-def hashable_to_dict(obj):
+def parse_catalogue_cached(file_path, tasks, relationship_tasks, cache_path=None):
     """
-    Konvertiert ein hashbares Tupel zurück zu einem Dictionary.
+    Wie parse_feature_catalogue, liest das Zwischenmodell aber aus dem Parse-Cache, solange
+    Inhalt der XML-Datei, Parser (parser_version) und ID-Tag unverändert sind; sonst wird geparst
+    und der Cache neu geschrieben. Der Cache enthält den Katalog ohne vorhandene Einträge,
+    diese (entity_lookup aus --resume/--prefetch) werden danach wie beim Parsen übernommen.
     """
-    if obj is None:
-        return None
-    elif isinstance(obj, tuple) and len(obj) > 0 and isinstance(obj[0], tuple) and len(obj[0]) == 2:
-        # Es ist ein Dictionary-Tupel
-        return {k: hashable_to_dict(v) for k, v in obj}
+    if cache_path is None:
+        return parse_feature_catalogue(file_path, tasks, relationship_tasks)
+    cache_key = {"source": source_digest(file_path), "parser": parser_version(), "id_tag": state.id_tag}
+    known_entities = dict(state.entity_lookup)
+    state.entity_lookup.clear()
+    cached = load_parse_cache(cache_path, cache_key, {entity_type.name: entity_type for entity_type in EntityType},
+                              {rel_type.value: rel_type for rel_type in RelType})
+    if cached is not None:
+        ns, dictAttrs, entities, relationships = cached
+        logging.info(f"Parse-Cache {cache_path} verwendet")
     else:
-        return obj
+        entities = []
+        relationships = []
+        ns, dictAttrs = parse_feature_catalogue(file_path, entities, relationships)
+        write_parse_cache(cache_path, cache_key, ns, dictAttrs, entities, relationships)
+        logging.info(f"Parse-Cache {cache_path} geschrieben")
+
+    id_map = {}
+    for attrs in [dictAttrs, *entities]:
+        lookup_key = attrs.key
+        existing_id = known_entities.get(lookup_key)
+        if existing_id is None:
+            state.entity_lookup[lookup_key] = attrs.id
+            if attrs is not dictAttrs:
+                tasks.append(attrs)
+            continue
+        count_prefetched_entity(existing_id)
+        id_map[attrs.id] = existing_id
+        attrs.id = existing_id
+        attrs.is_new = False
+    state.entity_lookup.update(known_entities)
+    if id_map:
+        relationships = [
+            (rel_type, props, id_map.get(from_id, from_id), [id_map.get(to_id, to_id) for to_id in to_ids])
+            for rel_type, props, from_id, to_ids in relationships
+        ]
+    relationship_tasks.extend(relationships)
+    return ns, dictAttrs
+
+def log_avoided_calls():
+    if state.avoided_calls["entities"] or state.avoided_calls["relationships"]:
+        logging.info(f"Vorabgleich: {state.avoided_calls['entities']} Entity-Anlagen und {state.avoided_calls['relationships']} Relationen eingespart")
+    if state.avoided_calls["existing_entities"]:
+        logging.info(f"{state.avoided_calls['existing_entities']} Entities existierten bereits mit derselben ID")
+
+def node_relationships(node):
+    """
+    Liefert die ausgehenden Beziehungen eines Eintrags aus find_tagged_entries
+    als (relationship_type, from_id, to_id).
+    """
+    from_id = node["id"]
+    edges = []
+    if node.get("dictionary"):
+        edges.append((RelType.DICTIONARY, from_id, node["dictionary"]["id"]))
+    for target in node.get("properties") or []:
+        edges.append((RelType.PROPERTIES, from_id, target["id"]))
+    for connected in node.get("connectedSubjects") or []:
+        for target in connected.get("targetSubjects") or []:
+            edges.append((RelType.RELATIONSHIP_TO_SUBJECT, from_id, target["id"]))
+    for target in node.get("possibleValues") or []:
+        edges.append((RelType.POSSIBLE_VALUES, from_id, target["id"]))
+    for value in node.get("values") or []:
+        edges.append((RelType.VALUES, from_id, value["orderedValue"]["id"]))
+    return edges
+
+def prefetch_existing_entries(token, tagId, page_size, catalog_state=None):
+    """
+    Lädt alle Einträge und Beziehungen mit dem Import-Tag seitenweise vom Server und
+    trägt sie in entity_lookup und relation_lookup ein, bevor geparst wird. Bereits
+    vorhandene Entities und Relationen werden so nicht erneut angelegt.
+    catalog_state: CatalogState, der zusätzlich den vollständigen Stand aufnimmt (--sync)
+    """
+    page_number = 0
+    entries = 0
+    while True:
+        nodes, has_next, total = find_tagged_entries(token, tagId, page_size, page_number)
+        for node in nodes:
+            state.entity_lookup[entity_key(node["name"], node["recordType"], node.get("description"))] = node["id"]
+            state.prefetched_ids.add(node["id"])
+            if catalog_state is not None:
+                catalog_state.add_entity(node["id"], node["name"], node["recordType"], node.get("description"))
+            for rel_key in node_relationships(node):
+                state.relation_lookup.add(rel_key)
+                state.prefetched_relations.add(rel_key)
+                if catalog_state is not None:
+                    catalog_state.add_edge(*rel_key)
+        entries += len(nodes)
+        page_number += 1
+        if not has_next or not nodes:
+            break
+    logging.info(f"Vorabgleich: {entries} von {total} vorhandenen Einträgen und {len(state.prefetched_relations)} Relationen in {page_number} Abrufen geladen")
+
+def log_unknown_schema_type(level, tag):
+    # Wird am Ende je Tag zusammengefasst (log_counts.log_summary)
+    log_counts.count("Unbekannter Schema-Typ", f"[{level}] {tag}")
+    parse_log.debug("Unbekannter Schema-Typ [%s]: %s", level, tag)
+
+def split_relationship(rel_args):
+    """
+    Zerlegt eine Beziehung in Teile mit höchstens max_to_ids Ziel-IDs (Reihenfolge bleibt erhalten).
+    """
+    rel_type, props, from_id, to_ids = rel_args
+    max_to_ids = current_state().max_to_ids
+    if max_to_ids is None or len(to_ids) <= max_to_ids:
+        return [rel_args]
+    return [(rel_type, props, from_id, chunk) for chunk in chunked(to_ids, max_to_ids)]
 
 def optimize_relationship_tasks(relationship_tasks):
     """
     Optimiert relationship_tasks, indem Einträge mit gleichen (relationship_type, props, from_id) 
     zusammengeführt werden und die to_ids in einem Array gesammelt werden.
+
+    Die to_ids behalten die Reihenfolge ihres ersten Auftretens im Katalog, das Ergebnis
+    ist also für dieselbe Datei immer gleich. Lange Listen werden in Teile mit höchstens
+    max_to_ids Ziel-IDs zerlegt; die Teile derselben from_id stehen nicht hintereinander,
+    sondern reihum (erst alle ersten Teile, dann alle zweiten, ...).
     """
     # Dictionary zum Sammeln der optimierten Relationships
-    # Key: (relationship_type, props_hash, from_id)
-    # Value: set of to_ids
+    # Key: (relationship_type, props, from_id); props sind geteilte Konstanten
+    # (REL_TO_SUBJ_PROPS, value_order_props), daher genügt ihre Identität
+    # Value: dict als geordnete Menge der to_ids
     optimized = {}
+    props_by_id = {}
     
     for rel_type, props, from_id, to_ids in relationship_tasks:
-        # Props zu einem hashbaren Wert konvertieren (für Dictionary-Key)
-        props_key = dict_to_hashable(props)
+        props_by_id[id(props)] = props
         
         # Schlüssel für die Gruppierung erstellen
-        key = (rel_type, props_key, from_id)
+        key = (rel_type, id(props), from_id)
         
-        # to_ids zu einem Set hinzufügen (um Duplikate zu vermeiden)
+        # to_ids in Reihenfolge hinzufügen (Duplikate entfallen)
         if key not in optimized:
-            optimized[key] = set()
+            optimized[key] = {}
         
         # Alle to_ids hinzufügen
         if isinstance(to_ids, list):
-            optimized[key].update(to_ids)
+            optimized[key].update(dict.fromkeys(to_ids))
         else:
-            optimized[key].add(to_ids)
+            optimized[key][to_ids] = None
     
-    # Zurück zu der ursprünglichen Struktur konvertieren
-    result = []
-    for (rel_type, props_key, from_id), to_ids_set in optimized.items():
-        # props_key zurück zu Dictionary konvertieren
-        props = hashable_to_dict(props_key)
-        
-        # Set zurück zu List konvertieren
-        to_ids_list = list(to_ids_set)
-        
-        result.append((rel_type, props, from_id, to_ids_list))
+    # Zurück zu der ursprünglichen Struktur konvertieren, Teile reihum ausgeben
+    parts = [
+        split_relationship((rel_type, props_by_id[props_key], from_id, list(to_ids)))
+        for (rel_type, props_key, from_id), to_ids in optimized.items()
+    ]
+    result = [group[0] for group in parts]
+    remaining = [group for group in parts if len(group) > 1]
+    index = 1
+    while remaining:
+        result.extend(group[index] for group in remaining)
+        index += 1
+        remaining = [group for group in remaining if len(group) > index]
     
     return result
 
-def create_relationship_with_retry(rel_args):
+def chunked(items, size):
+    """
+    Zerlegt eine Liste in aufeinanderfolgende Teillisten der Länge size.
+    """
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+def filter_new_relations(rel_args):
+    """
+    Entfernt bereits angelegte bzw. eingeplante Ziel-IDs. Liefert None, wenn nichts übrig bleibt.
+    """
     rel_type, properties, from_id, to_ids = rel_args
+    import_state = current_state()
     new_to_ids = []
     for to_id in to_ids:
         rel_key = (rel_type, from_id, to_id)
-        if rel_key in relation_lookup:
+        if rel_key in import_state.relation_lookup:
+            if rel_key in import_state.prefetched_relations:
+                import_state.prefetched_relations.discard(rel_key)
+                import_state.avoided_calls["relationships"] += 1
             continue
-        relation_lookup.add(rel_key)
+        import_state.relation_lookup.add(rel_key)
         new_to_ids.append(to_id)
-    if new_to_ids:
-        max_retries = 5
-        for attempt in range(1, max_retries + 1):
+    if not new_to_ids:
+        return None
+    return (rel_type, properties, from_id, new_to_ids)
+
+async def send_relationships(client, rel_batch):
+    """
+    Sendet einen Batch von Beziehungen. Liefert die Beziehungen mit Lock-Konflikt,
+    damit der Scheduler nur diese erneut sendet.
+    """
+    results = await client.create_relationships(rel_batch)
+
+    conflicts = []
+    for rel_args, result in zip(rel_batch, results):
+        rel_type, _, from_id, to_ids = rel_args
+        if 'errors' not in result:
+            if state.journal is not None:
+                state.journal.record_relationships(rel_type, from_id, to_ids)
+            continue
+        error_messages = str(result['errors'])
+        if 'lock' in error_messages.lower():
+            conflicts.append(rel_args)
+            continue
+        relationship_log.error("Fehler beim Anlegen der Beziehung: %s\nBeziehungsparameter: type=%s, fromId=%s, toId=%s",
+                               error_messages, rel_type, from_id, to_ids)
+    commit_journal()
+    return conflicts
+
+async def run_entity_phase(client, tasks, tagId, batch_size, on_created=None):
+    """
+    Legt alle Entities batchweise an; der Limiter des Clients begrenzt die parallelen Requests.
+    on_created wird je Batch mit den angelegten IDs aufgerufen, zuletzt für die über den
+    add_tag-Fallback getaggten Entities. Liefert alle angelegten IDs.
+    """
+    async def create_batch(batch):
+        ids = await create_entries(client, batch, tagId)
+        if on_created is not None:
+            on_created(ids)
+        return ids
+
+    batches = chunked(tasks, batch_size)
+    results = await asyncio.gather(*(create_batch(batch) for batch in batches), return_exceptions=True)
+    entry_ids = []
+    for batch, result in zip(batches, results):
+        if isinstance(result, Exception):
+            entity_log.error("Fehler bei Entity-Erstellung: %s, Batch: %s", result, [task.id for task in batch])
+        else:
+            entry_ids.extend(result)
+    tagged_ids = await apply_tag_fallbacks(client, tagId, batch_size)
+    if on_created is not None:
+        on_created(tagged_ids)
+    return entry_ids + tagged_ids
+
+def dictionary_linker(client, shared_with=None):
+    """
+    Eigener Scheduler für die Dictionary-Beziehungen. Jede sperrt das Dictionary, sie
+    laufen daher ohnehin nacheinander; ein Request bündelt bis zu link_batch_size davon,
+    statt sie einzeln zwischen die übrigen Beziehungen zu mischen.
+    shared_with: gleichzeitig laufender Scheduler, mit dem der Linker seine Sperrschlüssel teilt
+    """
+    return relationship_scheduler(client, state.link_batch_size, shared_with)
+
+def link_entities(linker, ids, dictionary_id):
+    for id in ids:
+        if id == dictionary_id:
+            continue
+        rel_args = filter_new_relations((RelType.DICTIONARY, None, id, [dictionary_id]))
+        if rel_args is not None:
+            linker.submit(rel_args)
+
+def limiter_probes(limiter):
+    """
+    Stichproben für die Auslastung der Request-Parallelität.
+    """
+    return {
+        "requests_in_flight": lambda: limiter.in_flight,
+        "requests_waiting": lambda: limiter.waiting,
+        "concurrency_limit": lambda: int(limiter.limit),
+        "concurrency_utilization": lambda: limiter.in_flight / max(int(limiter.limit), 1),
+    }
+
+def scheduler_probes(scheduler):
+    return {
+        "relationships_pending": lambda: scheduler.pending,
+        "relationship_batches_in_flight": lambda: len(scheduler.in_flight),
+    }
+
+def relationship_scheduler(client, batch_size, shared_with=None):
+    return RelationshipScheduler(partial(send_relationships, client), client.concurrency, batch_size, client.policy,
+                                 state.max_to_ids, shared_with)
+
+async def run_relationship_phase(client, relationships, batch_size):
+    """
+    Legt die Beziehungen parallel über den RelationshipScheduler an, der sie
+    nach Sperrschlüsseln (from_id und Ziel-IDs) partitioniert.
+    """
+    scheduler = relationship_scheduler(client, batch_size)
+    for rel_args in relationships:
+        rel_args = filter_new_relations(rel_args)
+        if rel_args is not None:
+            scheduler.submit(rel_args)
+    scheduler.close()
+    sampler = asyncio.ensure_future(metrics.sample_periodically(scheduler_probes(scheduler)))
+    try:
+        await scheduler.run()
+    finally:
+        sampler.cancel()
+
+async def upload_catalogue(client, tagId, dictAttrs, tasks, relationship_tasks, batch_size, resumed_ids=(), log_prefix=""):
+    """
+    Überträgt einen geparsten Katalog über einen bestehenden Client: Dictionary, Entities
+    (mit überlappender Verknüpfung zum Dictionary) und Beziehungen.
+    """
+    # Create Dictionary from FeatureCatalogue (beim Fortsetzen ggf. bereits vorhanden)
+    if dictAttrs.is_new:
+        await create_entry(client, dictAttrs, tagId)
+    dictionaryId = dictAttrs.id
+
+    # Dictionary-Beziehungen entstehen parallel zur Entity-Phase, sobald ein Batch angelegt ist
+    # Beim Fortsetzen auch für bereits angelegte Entries (bereits angelegte Relationen filtert relation_lookup)
+    linker = dictionary_linker(client)
+    linker_task = asyncio.ensure_future(linker.run())
+    link_entities(linker, resumed_ids, dictionaryId)
+
+    start0 = time.time()
+    # Parallelisierte Entity-Erstellung
+    await run_entity_phase(client, tasks, tagId, batch_size, partial(link_entities, linker, dictionary_id=dictionaryId))
+    metrics.record_phase("entities", time.time() - start0)
+    logging.info(f"{log_prefix}Dauer Erstellung Entities: {time.time() - start0:.2f} Sekunden")
+
+    # Die Verknüpfung läuft während der Entity-Phase; gemessen wird nur ihr Nachlauf
+    start_links = time.time()
+    linker.close()
+    await linker_task
+    metrics.record_phase("dictionary_links", time.time() - start_links)
+    logging.info(f"{log_prefix}Dauer Dictionary-Beziehungen (nach den Entities): {time.time() - start_links:.2f} Sekunden")
+
+    start1 = time.time()
+    await run_relationship_phase(client, relationship_tasks, batch_size)
+    metrics.record_phase("relationships", time.time() - start1)
+    logging.info(f"{log_prefix}Dauer Erstellung Relationen: {time.time() - start1:.2f} Sekunden")
+
+async def run_import(token, tagId, dictAttrs, tasks, relationship_tasks, limiter, batch_size, resumed_ids=()):
+    async with AsyncGraphQLClient(token, limiter=limiter) as client:
+        sampler = asyncio.ensure_future(metrics.sample_periodically(limiter_probes(limiter)))
+        await upload_catalogue(client, tagId, dictAttrs, tasks, relationship_tasks, batch_size, resumed_ids)
+        logging.info(limiter.summary())
+        sampler.cancel()
+
+def parse_catalogue(file_path, catalogue_id_tag=None, max_to_ids=None):
+    """
+    Liest einen Katalog vollständig ein und optimiert seine Beziehungen; läuft für den
+    Mehrfach-Import in einem eigenen Prozess. Jeder Katalog hat eigene Entities, die
+    Lookup-Tabelle beginnt daher leer.
+    catalogue_id_tag: Tag für deterministische IDs (None = zufällige IDs)
+    max_to_ids: Höchstzahl Ziel-IDs je Beziehung aus dem Hauptprozess (None = unbegrenzt)
+    Liefert (dictAttrs, tasks, relationship_tasks).
+    """
+    # Jeder Katalog beginnt im Parse-Prozess mit einem eigenen Zustand
+    _current_state.set(ImportState(id_tag=catalogue_id_tag, max_to_ids=max_to_ids))
+    tasks = []
+    relationship_tasks = []
+    _, dictAttrs = parse_feature_catalogue(file_path, tasks, relationship_tasks)
+    # Zusammengefasste Meldungen werden im Hauptprozess ausgegeben
+    return dictAttrs, tasks, optimize_relationship_tasks(relationship_tasks), log_counts.drain()
+
+def init_parse_process(parent_log_file):
+    # Ein Parse-Prozess protokolliert direkt; vom Hauptprozess geerbte Zähler gehören nicht zu ihm
+    worker_logging(parent_log_file)
+    log_counts.drain()
+
+async def run_catalogues(token, catalogues, limiter, batch_size, parse_workers, deterministic_ids=False):
+    """
+    Importiert mehrere Kataloge (file_path, tagId) mit je eigenem Tag und Dictionary. Die
+    Kataloge werden parallel in einem Prozess-Pool eingelesen; jeder wird übertragen, sobald
+    er eingelesen ist, und alle Übertragungen teilen sich Client und Limiter. Die Laufzeit
+    liegt so nahe max(Einlesen) + Übertragung statt bei der Summe der Einzelläufe.
+    """
+    loop = asyncio.get_running_loop()
+    async with AsyncGraphQLClient(token, limiter=limiter) as client:
+        sampler = asyncio.ensure_future(metrics.sample_periodically(limiter_probes(limiter)))
+        with ProcessPoolExecutor(max_workers=parse_workers, initializer=init_parse_process,
+                                 initargs=(ImportLogging.active_log_file,)) as pool:
+            async def import_catalogue(file_path, tagId):
+                log_prefix = f"[{os.path.basename(file_path)}] "
+                start_parse = time.time()
+                dictAttrs, tasks, relationship_tasks, parse_counts = await loop.run_in_executor(
+                    pool, parse_catalogue, file_path, tagId if deterministic_ids else None, state.max_to_ids)
+                log_counts.merge(parse_counts)
+                metrics.record_phase("parse", time.time() - start_parse)
+                logging.info(f"{log_prefix}Dauer Einlesen XML: {time.time() - start_parse:.2f} Sekunden, "
+                             f"{len(tasks)} Entities, {len(relationship_tasks)} Relationen")
+                await upload_catalogue(client, tagId, dictAttrs, tasks, relationship_tasks, batch_size,
+                                       log_prefix=log_prefix)
+                logging.info(f"{log_prefix}Import abgeschlossen nach {time.time() - start_parse:.2f} Sekunden")
+
+            results = await asyncio.gather(*(import_catalogue(file_path, tagId) for file_path, tagId in catalogues),
+                                           return_exceptions=True)
+        for (file_path, _), result in zip(catalogues, results):
+            if isinstance(result, Exception):
+                logging.error(f"Import von {file_path} fehlgeschlagen: {result!r}")
+        logging.info(limiter.summary())
+        sampler.cancel()
+
+async def run_pipelined_import(token, tagId, file_path, limiter, batch_size, queue_size, resumed_ids=(), profile_options=None):
+    """
+    Pipeline-Modus ohne Phasengrenzen: Der Parser läuft in einem Thread und legt Entities
+    in eine begrenzte Warteschlange, aus der die Entity-Worker Batches bilden. Jede Beziehung
+    wird freigegeben, sobald alle ihre Endpunkte bestätigt angelegt sind.
+    profile_options: Argumente für metrics.profile beim Parsen (profile_path, trace_memory)
+    """
+    loop = asyncio.get_running_loop()
+    async with AsyncGraphQLClient(token, limiter=limiter) as client:
+        entity_queue = asyncio.Queue(maxsize=queue_size)
+        scheduler = relationship_scheduler(client, batch_size)
+        # Linker und Scheduler laufen gleichzeitig und sperren dieselben Entities
+        linker = dictionary_linker(client, shared_with=scheduler)
+        dictionary = {}
+        busy_workers = [0]
+
+        def release(rel_args):
+            rel_args = filter_new_relations(rel_args)
+            if rel_args is None:
+                return
+            if rel_args[0] is RelType.DICTIONARY:
+                linker.submit(rel_args)
+                return
+            for part in split_relationship(rel_args):
+                scheduler.submit(part)
+
+        # IDs aus entity_lookup existieren bereits und gelten als bestätigt
+        tracker = DependencyTracker(release, confirmed=state.entity_lookup.values())
+
+        def on_dictionary(dictAttrs):
+            dictionary["id"] = dictAttrs.id
+            if dictAttrs.is_new:
+                entity_sink.append(dictAttrs)
+
+        async def entity_worker():
+            while True:
+                item = await entity_queue.get()
+                if item is None:
+                    return
+                batch = [item]
+                while len(batch) < batch_size and not entity_queue.empty():
+                    item = entity_queue.get_nowait()
+                    if item is None:
+                        await confirm_batch(batch)
+                        return
+                    batch.append(item)
+                await confirm_batch(batch)
+
+        async def confirm_batch(batch):
+            busy_workers[0] += 1
             try:
-                result = create_relationship(token, rel_type, properties, from_id, new_to_ids)
-                if result and isinstance(result, dict) and 'errors' in result:
-                    error_messages = str(result['errors'])
-                    if 'lock' in error_messages.lower() and attempt < max_retries:
-                        sleep_time = random.uniform(1, 5)
-                        time.sleep(sleep_time)
-                        continue
-                    logging.error(f"Fehler beim Anlegen der Beziehung: {error_messages}\nBeziehungsparameter: type={rel_type}, fromId={from_id}, toId={new_to_ids}")
-                break
+                ids = await create_entries(client, batch, tagId)
             except Exception as e:
-                if 'lock' in str(e).lower() and attempt < max_retries:
-                    sleep_time = random.uniform(1, 5)
-                    time.sleep(sleep_time)
-                    continue
-                logging.error(f"Fehler beim Anlegen der Beziehung: {e}\nBeziehungsparameter: type={rel_type}, fromId={from_id}, toId={new_to_ids}")
-                break
-                
-if __name__ == "__main__":
-    start = time.time()
-    # Login
-    token = login()
-    # logging.info("Login erfolgreich")
+                entity_log.error("Fehler bei Entity-Erstellung: %s, Batch: %s", e, [task.id for task in batch])
+                return
+            finally:
+                busy_workers[0] -= 1
+            confirm_ids(ids)
 
-    # Find or create tag
-    tagId = "GeoInfoDokId"
-    tagName = "GeoInfoDok"
-    # file_path = "resources/aaa_mini.xml"
-    file_path = "resources/aaa.xml"
+        def confirm_ids(ids):
+            for id in ids:
+                tracker.confirm(id)
+                if id != dictionary.get("id"):
+                    tracker.add((RelType.DICTIONARY, None, id, [dictionary["id"]]))
 
-    tag = get_tag(token, tagId)
-    # logging.info("Tag abgerufen:", tag)
-    if not tag:
-        logging.info("Tag nicht gefunden, erstelle neuen Tag.")
-        tag = create_tag(token, tagName, tagId)
-        logging.info(f"Tag erstellt: {tag}")
-    
-    # Validierung, dass tagId korrekt ist
-    if tagId is None:
-        logging.error("tagId ist None - kann nicht fortfahren")
-        exit(1)
-    
-    logging.info(f"Verwende tagId: {tagId}")
+        entity_sink = ThreadSafeSink(loop, queue=entity_queue)
+        relationship_sink = ThreadSafeSink(
+            loop,
+            callback=tracker.add,
+            # Die ID-Listen wachsen im Parser weiter, daher eine Momentaufnahme weitergeben
+            transform=lambda rel_args: (rel_args[0], rel_args[1], rel_args[2], list(rel_args[3]))
+        )
 
-    ns = {}
-    for event, elem in ET.iterparse(file_path, events=("start-ns", "start")):
-        if event == "start-ns":
-            ns[elem[0] or ""] = elem[1]
+        start0 = time.time()
+        scheduler_task = asyncio.ensure_future(scheduler.run())
+        linker_task = asyncio.ensure_future(linker.run())
+        workers = [asyncio.ensure_future(entity_worker()) for _ in range(client.concurrency)]
+        sampler = asyncio.ensure_future(metrics.sample_periodically({
+            **limiter_probes(limiter),
+            **scheduler_probes(scheduler),
+            "entity_queue_depth": entity_queue.qsize,
+            "entity_worker_utilization": lambda: busy_workers[0] / len(workers),
+            "relationships_waiting_for_entities": lambda: tracker.pending,
+        }))
+        def parse():
+            with metrics.profile("parse", **(profile_options or {})):
+                parse_feature_catalogue(file_path, entity_sink, relationship_sink, on_dictionary)
+            entity_sink.flush()
+            relationship_sink.flush()
 
-    tree = ET.parse(file_path)
-    root = tree.getroot()
+        # Der Parse-Thread arbeitet auf dem Zustand dieses Imports
+        await loop.run_in_executor(None, contextvars.copy_context().run, parse)
+        metrics.record_phase("parse", time.time() - start0)
+        logging.info(f"Dauer Einlesen XML: {time.time() - start0:.2f} Sekunden")
+        logging.info(f"Anzahl der Entities: {entity_sink.count}, Anzahl der Relationen: {relationship_sink.count}")
 
-    # Lookup-Tabellen und Task Sammlungen für Entities und Relationen
-    entity_lookup = {}  # (name, typ, description) -> id
-    relation_lookup = set()  # (relationship_type, from_id, [to_ids])
-    tasks = [] # List of entity dictionaries: {id, properties, entityType, is_new}
-    relationship_tasks = [] # (relationship_type, props, from_id, [to_ids])
-    entry_ids = []  # IDs die eine Dictionary-Beziehung benötigen
-    
-    rel_to_subj_props = {"relationshipToSubjectProperties": {"relationshipType": "XTD_SCHEMA_LEVEL"}}
-
-    # Create Dictionary from FeatureCatalogue
-    dictAttrs = prepare_entity_attributes(root, EntityType.DICTIONARY, ns)
-    create_entry(dictAttrs, token, tagId)
-    dictionaryId = dictAttrs["id"]
-    # logging.info(f"Dictionary ID: {dictionaryId}")
-
-    for child in root.findall(XmlTag.CONNECTOR.tag(ns)):
-        level1 = child[0]
-
-        if level1.tag == XmlTag.OBJEKTARTENBEREICH.tag(ns):
-            attrs1 = prepare_entity_attributes(level1, EntityType.THEMA, ns)
-            if attrs1.get("is_new", True):
-                tasks.append(attrs1)
-            collected_theme_ids = []
-            collected_class_ids = []
-
-            for element1 in level1.findall(XmlTag.CONNECTOR.tag(ns)):
-                level2 = element1[0]
-                if level2.tag == XmlTag.OBJEKTARTENGRUPPE.tag(ns):
-                    attrs2 = prepare_entity_attributes(level2, EntityType.THEMA, ns)
-                    if attrs2.get("is_new", True):
-                        tasks.append(attrs2)
-                    collected_theme_ids.append(attrs2["id"])
-
-                    collected_class_ids = []
-                    for element2 in level2.findall(XmlTag.CONNECTOR.tag(ns)):
-                        level3 = element2[0]
-
-                        if level3.tag == XmlTag.FEATURETYPE.tag(ns) or level3.tag == XmlTag.DATATYPE.tag(ns):
-                            process_feature_type(level3, collected_class_ids, tasks, relationship_tasks, ns, 4)
-
-                        else:
-                            log_unknown_schema_type(3, level3.tag)
-                
-                elif level2.tag == XmlTag.FEATURETYPE.tag(ns) or level2.tag == XmlTag.DATATYPE.tag(ns):
-                    process_feature_type(level2, collected_class_ids, tasks, relationship_tasks, ns, 3)
+        # Dictionary-Beziehungen für Entries aus einem früheren Lauf
+        for id in resumed_ids:
+            if id != dictionary["id"]:
+                tracker.add((RelType.DICTIONARY, None, id, [dictionary["id"]]))
 
-                else:
-                    log_unknown_schema_type(2, level2.tag)
+        # Ein Endsignal je Worker; jeder Worker beendet sich nach seinem Signal
+        for _ in workers:
+            await entity_queue.put(None)
+        # Die Phasen überlappen sich; jede zählt ab dem Ende der vorigen, die Summe ergibt die Laufzeit
+        start_entities = time.time()
+        await asyncio.gather(*workers)
+        confirm_ids(await apply_tag_fallbacks(client, tagId, batch_size))
+        metrics.record_phase("entities", time.time() - start_entities)
+        logging.info(f"Dauer Erstellung Entities (nach dem Einlesen): {time.time() - start_entities:.2f} Sekunden")
 
-                relationship_tasks.append((RelType.RELATIONSHIP_TO_SUBJECT, rel_to_subj_props, attrs2["id"], collected_class_ids))
+        start_relationships = time.time()
+        tracker.close()
+        scheduler.close()
+        linker.close()
+        await asyncio.gather(scheduler_task, linker_task)
+        metrics.record_phase("relationships", time.time() - start_relationships)
+        logging.info(f"Dauer Erstellung Relationen (nach den Entities): {time.time() - start_relationships:.2f} Sekunden")
+        logging.info(limiter.summary())
+        sampler.cancel()
 
-            relationship_tasks.append((RelType.RELATIONSHIP_TO_SUBJECT, rel_to_subj_props, attrs1["id"], collected_theme_ids))
-            relationship_tasks.append((RelType.RELATIONSHIP_TO_SUBJECT, rel_to_subj_props, attrs1["id"], collected_class_ids))
+def log_sync_plan(sync_plan):
+    for line in sync_plan.details():
+        sync_log.info(line)
 
-        else:
-            log_unknown_schema_type(1, level1.tag)
+def prepare_batch_import(file_path, sync_state=None, cache_path=None, profile_options=None):
+    """
+    Liest den Katalog für den Batch-Import ein, gleicht ihn ggf. mit sync_state ab und
+    optimiert die Beziehungen. Liefert (dictAttrs, tasks, relationship_tasks, sync_plan).
+    """
+    tasks = [] # List of PlannedEntity
+    relationship_tasks = [] # (relationship_type, props, from_id, [to_ids])
 
+    # FeatureCatalogue in einem Durchlauf lesen (inkl. Dictionary aus dem Wurzelelement)
+    start_parse = time.time()
+    with metrics.profile("parse", **(profile_options or {})):
+        ns, dictAttrs = parse_catalogue_cached(file_path, tasks, relationship_tasks, cache_path)
+    metrics.record_phase("parse", time.time() - start_parse)
+    logging.info(f"Dauer Einlesen XML: {time.time() - start_parse:.2f} Sekunden")
 
     logging.info(f"Anzahl der Entities: {len(tasks)}")
     logging.info(f"Anzahl der Relationen vor Optimierung: {len(relationship_tasks)}")
 
+    sync_plan = None
+    if sync_state is not None:
+        sync_plan = diff_plan(sync_state, dictAttrs, tasks, relationship_tasks, RelType.DICTIONARY)
+        log_sync_plan(sync_plan)
+        tasks = sync_plan.created
+
     # Relationship-Tasks optimieren (zusammenführen)
     relationship_tasks = optimize_relationship_tasks(relationship_tasks)
     logging.info(f"Anzahl der Relationen nach Optimierung: {len(relationship_tasks)}")
+    return dictAttrs, tasks, relationship_tasks, sync_plan
 
-    # Optimale Anzahl an Threads
-    cpu_count = os.cpu_count()
-    optimal_workers = min(cpu_count*3, 20)
+def write_import_plan(file_path, plan_path, digest, profile_options, cache_path=None):
+    """
+    plan: liest den Katalog ein und schreibt den fertigen Import-Plan (deduplizierte
+    Entities, Dictionary-Beziehungen und optimierte Beziehungen) nach plan_path.
+    """
+    tasks = []
+    relationship_tasks = []
+    start_parse = time.time()
+    with metrics.profile("parse", **profile_options):
+        ns, dictAttrs = parse_catalogue_cached(file_path, tasks, relationship_tasks, cache_path)
+    relationship_tasks = optimize_relationship_tasks(relationship_tasks)
+    metrics.record_phase("parse", time.time() - start_parse)
+    logging.info(f"Dauer Einlesen XML: {time.time() - start_parse:.2f} Sekunden")
 
-    logging.info(f"CPU-Kerne: {cpu_count}, Verwende {optimal_workers} Worker")
+    writer = PlanWriter(plan_path, {"source": digest, "file": os.path.basename(file_path), "id_tag": state.id_tag})
+    writer.dictionary(dictAttrs)
+    for attrs in tasks:
+        writer.entity(attrs)
+    for attrs in tasks:
+        writer.relationship((RelType.DICTIONARY, None, attrs.id, [dictAttrs.id]))
+    for rel_args in relationship_tasks:
+        writer.relationship(rel_args)
+    writer.close()
+    logging.info(f"Import-Plan geschrieben: {plan_path} ({writer.entities} Entities, {writer.relationships} Beziehungen)")
 
-    start0 = time.time()
-    # Parallelisierte Entity-Erstellung
-    with ThreadPoolExecutor(max_workers=optimal_workers) as executor:
-        # Alle Tasks als Futures starten
-        future_to_task = {executor.submit(create_entry, task, token, tagId): task for task in tasks}
-        
-        # Ergebnisse sammeln
-        for future in as_completed(future_to_task):
-            try:
-                id = future.result()
-                if id:
-                    entry_ids.append(id)
-            except Exception as e:
-                task = future_to_task[future]
-                logging.error(f"Fehler bei Entity-Erstellung: {e}, Task: {task}")
+async def run_apply(token, tagId, plan_path, limiter, batch_size, done_ids=()):
+    """
+    apply: überträgt einen Import-Plan, ohne ihn vollständig zu laden. Entities werden
+    batchweise mit begrenzt vielen offenen Batches angelegt, die Beziehungen danach mit
+    Gegendruck an den RelationshipScheduler übergeben.
+    done_ids: bereits angelegte Entities (--resume); angelegte Beziehungen stehen in relation_lookup
+    """
+    entity_types = {entity_type.name: entity_type for entity_type in EntityType}
+    rel_types = {rel_type.value: rel_type for rel_type in RelType}
+    async with AsyncGraphQLClient(token, limiter=limiter) as client:
+        sampler = asyncio.ensure_future(metrics.sample_periodically(limiter_probes(limiter)))
+        scheduler = relationship_scheduler(client, batch_size)
+        scheduler_task = None
+        linker = dictionary_linker(client)
+        linker_task = None
+        batch = []
+        entity_batches = set()
+        # Beginn der laufenden Phase (Entities, Dictionary-Beziehungen, Relationen)
+        phase_start = time.time()
+
+        async def wait_entity_batches(limit):
+            while len(entity_batches) > limit:
+                done, _ = await asyncio.wait(entity_batches, return_when=asyncio.FIRST_COMPLETED)
+                entity_batches.difference_update(done)
+                for task in done:
+                    if task.exception() is not None:
+                        entity_log.error("Fehler bei Entity-Erstellung: %s", task.exception())
+
+        async def send_entity_batch():
+            nonlocal batch
+            if batch:
+                entity_batches.add(asyncio.ensure_future(create_entries(client, batch, tagId)))
+                batch = []
+            await wait_entity_batches(2 * client.concurrency)
+
+        async def start_links():
+            # Beziehungen erst, wenn alle Entities bestätigt sind
+            nonlocal linker_task, phase_start
+            await send_entity_batch()
+            await wait_entity_batches(0)
+            await apply_tag_fallbacks(client, tagId, batch_size)
+            metrics.record_phase("entities", time.time() - phase_start)
+            logging.info(f"Dauer Erstellung Entities: {time.time() - phase_start:.2f} Sekunden")
+            phase_start = time.time()
+            linker_task = asyncio.ensure_future(linker.run())
+
+        async def start_relationships():
+            # Die Dictionary-Beziehungen stehen im Plan vor allen übrigen und sperren deren Endpunkte
+            nonlocal scheduler_task, phase_start
+            if linker_task is None:
+                await start_links()
+            linker.close()
+            await linker_task
+            metrics.record_phase("dictionary_links", time.time() - phase_start)
+            logging.info(f"Dauer Dictionary-Beziehungen: {time.time() - phase_start:.2f} Sekunden")
+            phase_start = time.time()
+            scheduler_task = asyncio.ensure_future(scheduler.run())
+
+        for kind, item in iter_plan(plan_path, entity_types, rel_types):
+            if kind == "relationship":
+                rel_type, props, from_id, to_ids = item
+                if rel_type is RelType.DICTIONARY and scheduler_task is None:
+                    if linker_task is None:
+                        await start_links()
+                    target = linker
+                else:
+                    if scheduler_task is None:
+                        await start_relationships()
+                    target = scheduler
+                to_ids = [to_id for to_id in to_ids if (rel_type, from_id, to_id) not in state.relation_lookup]
+                if to_ids:
+                    await target.wait_below(APPLY_RELATIONSHIP_WINDOW)
+                    target.submit((rel_type, props, from_id, to_ids))
+            elif item.id in done_ids:
+                continue
+            elif kind == "dictionary":
+                await create_entry(client, item, tagId)
+            else:
+                batch.append(item)
+                if len(batch) >= batch_size:
+                    await send_entity_batch()
+
+        if scheduler_task is None:
+            await start_relationships()
+        scheduler.close()
+        await scheduler_task
+        metrics.record_phase("relationships", time.time() - phase_start)
+        logging.info(f"Dauer Erstellung Relationen: {time.time() - phase_start:.2f} Sekunden")
+        logging.info(limiter.summary())
+        sampler.cancel()
+
+def limiter_from_env(adaptive=True):
+    """
+    Limiter für alle Requests: höchstens DATACAT_CONCURRENCY gleichzeitig; er startet bei
+    DATACAT_INITIAL_CONCURRENCY und passt die Parallelität an die Serverlast an.
+    """
+    max_rps = os.getenv("DATACAT_MAX_RPS")
+    target_latency = os.getenv("DATACAT_TARGET_LATENCY")
+    return AdaptiveLimiter(
+        max(int(os.getenv("DATACAT_CONCURRENCY", "100")), 1),
+        initial=max(int(os.getenv("DATACAT_INITIAL_CONCURRENCY", "10")), 1),
+        target_latency=float(target_latency) if target_latency else None,
+        max_rps=float(max_rps) if max_rps else None,
+        adaptive=adaptive,
+    )
+
+def batch_settings_from_env():
+    """
+    Liefert (batch_size, max_to_ids, link_batch_size):
+    Anzahl der Mutationen, die in einem GraphQL-Dokument gebündelt werden; Höchstzahl von
+    Ziel-IDs je Beziehung und je Entity in einem Request (hält Sperren kurz);
+    Dictionary-Beziehungen je Request im eigenen Verknüpfungsschritt.
+    """
+    return (
+        max(int(os.getenv("DATACAT_BATCH_SIZE", "25")), 1),
+        max(int(os.getenv("DATACAT_MAX_TO_IDS", "100")), 1),
+        max(int(os.getenv("DATACAT_LINK_BATCH_SIZE", "250")), 1),
+    )
 
-    logging.info(f"Dauer Erstellung Entities: {time.time() - start0:.2f} Sekunden")
+def ensure_tag(token, tagId, tagName):
+    """
+    Sucht den Tag und legt ihn an, falls er fehlt.
+    """
+    tag = get_tag(token, tagId)
+    # logging.info("Tag abgerufen:", tag)
+    if not tag:
+        logging.info("Tag nicht gefunden, erstelle neuen Tag.")
+        tag = create_tag(token, tagName, tagId)
+        logging.info(f"Tag erstellt: {tag}")
+    return tag
+
+def prefetch_or_exit(token, tagId, page_size, catalog_state=None):
+    """
+    Vorabgleich für die Kommandozeile. Ein unvollständiger Stand würde Vorhandenes als
+    fehlend erscheinen lassen, daher bricht jeder fehlgeschlagene Abruf den Lauf ab.
+    """
+    start_prefetch = time.time()
+    try:
+        prefetch_existing_entries(token, tagId, page_size, catalog_state)
+    except RequestFailed as e:
+        logging.error(f"Vorabgleich fehlgeschlagen, Abbruch ohne Änderungen: {e}")
+        sys.exit(1)
+    metrics.record_phase("prefetch", time.time() - start_prefetch)
+
+def finish_run(start, args):
+    log_counts.log_summary()
+    log_avoided_calls()
+    metrics.record_phase("total", time.time() - start)
+    metrics.log_summary()
+    metrics.write(args.metrics_json, args.metrics_prom)
+    logging.info(f"Gesamtdauer: {time.time() - start:.2f} Sekunden")
+
+if __name__ == "__main__":
+    # Logfile zu Beginn leeren; Konsole und Datei über eine Queue, Level je Phase über DATACAT_LOG_LEVELS
+    open("logfile.txt", "w").close()
+    setup_logging("logfile.txt")
+    load_config()
+
+    parser = argparse.ArgumentParser(description="Importiert einen GeoInfoDok-FeatureCatalogue in DataCat.")
+    parser.add_argument("command", nargs="?", default="import", choices=("import", "plan", "apply"),
+                        help="import: einlesen und übertragen (Standard); plan: nur einlesen und den Import-Plan "
+                             "schreiben; apply: einen Import-Plan übertragen")
+    parser.add_argument("--plan", metavar="DATEI",
+                        help="Import-Plan für plan/apply (Standard: import_plan_<Hash der XML-Datei>.jsonl, "
+                             "mit Endung .gz komprimiert)")
+    parser.add_argument("--file", default="resources/aaa.xml",
+                        help="Zu importierender FeatureCatalogue")
+    parser.add_argument("--tag-id", default="GeoInfoDokId",
+                        help="ID des Import-Tags für --file")
+    parser.add_argument("--tag-name", default="GeoInfoDok",
+                        help="Name des Import-Tags, falls er angelegt wird")
+    parser.add_argument("--catalog", nargs=3, action="append", metavar=("DATEI", "TAG_ID", "TAG_NAME"),
+                        help="Katalog mit eigenem Tag importieren (mehrfach angebbar, ersetzt --file); mehrere "
+                             "Kataloge werden parallel eingelesen und gemeinsam übertragen")
+    parser.add_argument("--parse-workers", type=int,
+                        help="Prozesse zum Einlesen mehrerer Kataloge (Standard: Anzahl Kataloge, höchstens CPU-Kerne)")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="Parsen, Anlegen der Entities und der Beziehungen überlappend ausführen")
+    parser.add_argument("--queue-size", type=int, default=1000,
+                        help="Maximale Anzahl geparster Entities, die auf das Anlegen warten (Pipeline-Modus)")
+    parser.add_argument("--journal", default="import_journal.sqlite",
+                        help="Journal-Datei, in der bestätigte Entities, Tags und Relationen festgehalten werden")
+    parser.add_argument("--resume", action="store_true",
+                        help="Abgebrochenen Import anhand des Journals fortsetzen (lädt zusätzlich den Stand "
+                             "des Servers wie --prefetch)")
+    parser.add_argument("--prefetch", action="store_true",
+                        help="Vorhandene Einträge und Relationen mit dem Import-Tag vorab vom Server laden")
+    parser.add_argument("--prefetch-page-size", type=int, default=1000,
+                        help="Seitengröße beim Vorabgleich")
+    parser.add_argument("--sync", action="store_true",
+                        help="Mit dem Stand auf dem Server abgleichen: nur neue Einträge anlegen; geänderte und "
+                             "nicht mehr enthaltene Einträge und Relationen werden protokolliert, aber nicht "
+                             "verändert (mit --dry-run nur die Vorschau)")
+    parser.add_argument("--parse-cache", nargs="?", const="parse_cache.bin", metavar="DATEI",
+                        help="Geparstes Zwischenmodell in DATEI (Standard: parse_cache.bin) zwischenspeichern und "
+                             "wiederverwenden, solange XML-Datei und Parser unverändert sind")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Nur einlesen und Beziehungen optimieren, nichts an den Server senden")
+    parser.add_argument("--deterministic-ids", action="store_true",
+                        help="Entity-IDs aus Tag, Typ, Name und Beschreibung ableiten (uuid5) statt zufällig vergeben; "
+                             "wiederholte Importe erkennen vorhandene Einträge an der ID")
+    parser.add_argument("--fixed-concurrency", action="store_true",
+                        help="Parallelität fest auf DATACAT_CONCURRENCY halten statt sie anhand der Serverlast zu regeln")
+    parser.add_argument("--metrics-json", default="import_metrics.json",
+                        help="Zusammenfassung der Kennzahlen (JSON) am Ende des Laufs")
+    parser.add_argument("--metrics-prom", default="import_metrics.prom",
+                        help="Kennzahlen im Prometheus-Textformat am Ende des Laufs")
+    parser.add_argument("--profile-parse", metavar="DATEI",
+                        help="Parsen mit cProfile profilieren und die Daten in DATEI schreiben")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Speicherbelegung beim Parsen mit tracemalloc erfassen")
+    args = parser.parse_args()
+    if args.sync and args.pipeline:
+        parser.error("--sync ist nur ohne --pipeline möglich")
+    if args.command != "import" and (args.pipeline or args.sync or args.prefetch):
+        parser.error("--pipeline, --sync und --prefetch gelten nur für import")
+    catalogues = [tuple(catalog) for catalog in args.catalog or [(args.file, args.tag_id, args.tag_name)]]
+    if len(catalogues) > 1 and (args.command != "import" or args.pipeline or args.sync or args.prefetch or args.resume
+                                or args.profile_parse or args.trace_memory):
+        parser.error("Mehrere Kataloge nur für import ohne --pipeline, --sync, --prefetch, --resume und Profiling")
+    if args.parse_cache and (args.pipeline or args.command == "apply" or len(catalogues) > 1):
+        parser.error("--parse-cache gilt nur für import ohne --pipeline und plan mit einem Katalog")
+    if args.dry_run and (args.command != "import" or args.pipeline or args.prefetch or args.resume
+                         or len(catalogues) > 1):
+        parser.error("--dry-run gilt nur für import eines Katalogs ohne --pipeline, --prefetch und --resume")
+    profile_options = {"profile_path": args.profile_parse, "trace_memory": args.trace_memory}
+
+    start = time.time()
+
+    limiter = limiter_from_env(adaptive=not args.fixed_concurrency)
+    concurrency = limiter.maximum
+    batch_size, state.max_to_ids, state.link_batch_size = batch_settings_from_env()
+
+    file_path, tagId, tagName = catalogues[0]
+    if args.deterministic_ids:
+        state.id_tag = tagId
+
+    if args.command == "plan":
+        # Der Plan entsteht offline; je Katalogversion (Hash der XML-Datei) nur einmal
+        digest = source_digest(file_path)
+        plan_path = args.plan or default_plan_path(digest)
+        header = read_plan_header(plan_path)
+        if header is not None and header.get("source") == digest and header.get("id_tag") == state.id_tag:
+            logging.info(f"Import-Plan {plan_path} ist für {file_path} aktuell")
+        else:
+            write_import_plan(file_path, plan_path, digest, profile_options, args.parse_cache)
+        finish_run(start, args)
+        sys.exit(0)
+
+    if args.dry_run:
+        sync_state = None
+        if args.sync:
+            # Vorschau des Abgleichs: Stand des Servers nur lesen (auch das Tag wird nicht angelegt)
+            sync_state = CatalogState()
+            prefetch_or_exit(login(), tagId, args.prefetch_page_size, sync_state)
+        tasks = []
+        relationship_tasks = []
+        start_parse = time.time()
+        with metrics.profile("parse", **profile_options):
+            ns, dictAttrs = parse_catalogue_cached(file_path, tasks, relationship_tasks, args.parse_cache)
+        metrics.record_phase("parse", time.time() - start_parse)
+        logging.info(f"Dauer Einlesen XML: {time.time() - start_parse:.2f} Sekunden")
+        logging.info(f"Anzahl der Entities: {len(tasks)}")
+        logging.info(f"Anzahl der Relationen vor Optimierung: {len(relationship_tasks)}")
+        if sync_state is not None:
+            sync_plan = diff_plan(sync_state, dictAttrs, tasks, relationship_tasks, RelType.DICTIONARY)
+            log_sync_plan(sync_plan)
+        start_optimize = time.time()
+        relationship_tasks = optimize_relationship_tasks(relationship_tasks)
+        metrics.record_phase("optimize", time.time() - start_optimize)
+        logging.info(f"Anzahl der Relationen nach Optimierung: {len(relationship_tasks)}, "
+                     f"Ziel-IDs: {sum(len(rel_args[3]) for rel_args in relationship_tasks)}")
+        logging.info("Probelauf: nichts übertragen")
+        finish_run(start, args)
+        sys.exit(0)
+
+    plan_path = plan_header = None
+    if args.command == "apply":
+        plan_path = args.plan or default_plan_path(source_digest(file_path))
+        plan_header = read_plan_header(plan_path)
+        if plan_header is None:
+            logging.error(f"Kein Import-Plan unter {plan_path} - zuerst 'plan' ausführen")
+            sys.exit(1)
+        logging.info(f"Übertrage Import-Plan {plan_path} (Quelle {plan_header['file']}, {plan_header['source'][:16]})")
+
+    # Login
+    token = login()
+    # logging.info("Login erfolgreich")
+
+    # Find or create tag
+    for _, catalogue_tag_id, catalogue_tag_name in catalogues:
+        ensure_tag(token, catalogue_tag_id, catalogue_tag_name)
     
-    start1 = time.time()
-    # Dictionary-Beziehungen erstellen
-    for id in entry_ids:
-        create_relationship_with_retry((RelType.DICTIONARY, None, id, [dictionaryId]))
-    logging.info(f"Dauer Erstellung Dictionary-Relationen: {time.time() - start1:.2f} Sekunden")
+    # Validierung, dass tagId korrekt ist
+    if tagId is None:
+        logging.error("tagId ist None - kann nicht fortfahren")
+        exit(1)
     
-    start2 = time.time()
+    logging.info(f"Verwende tagId: {', '.join(catalogue[1] for catalogue in catalogues)}")
 
-    for rel_args in relationship_tasks:
-        create_relationship_with_retry(rel_args)
+    state.journal = ImportJournal(args.journal, resume=args.resume)
+    # Ein Journal gehört entweder zu XML-Dateien (import) oder zu einem Plan (apply)
+    journal_meta = {
+        "tagId": ",".join(catalogue[1] for catalogue in catalogues),
+        "file_path": ",".join(catalogue[0] for catalogue in catalogues) if plan_header is None else None,
+        "plan": plan_header["source"] if plan_header is not None else None,
+    }
+    resumed_ids = []
+    if args.resume:
+        if any(state.journal.get_meta(key) not in (None, value) for key, value in journal_meta.items()):
+            logging.error(f"Journal {args.journal} gehört zu einem anderen Import - kann nicht fortsetzen")
+            sys.exit(1)
+        # Bestätigte Arbeit aus dem Journal übernehmen
+        resumed_entities = state.journal.load_entities()
+        state.entity_lookup.update((entity_key(*key), id) for key, id in resumed_entities.items())
+        state.relation_lookup.update(state.journal.load_relationships({rel_type.value: rel_type for rel_type in RelType}))
+        resumed_ids = [id for key, id in resumed_entities.items() if key[1] != EntityType.DICTIONARY.value[1]]
+        logging.info(f"Fortsetzen: {len(resumed_entities)} Entities und {len(state.relation_lookup)} Relationen aus dem Journal übernommen")
+    for key, value in journal_meta.items():
+        state.journal.set_meta(key, value)
 
-    logging.info(f"Dauer Erstellung Relationen: {time.time() - start2:.2f} Sekunden")
-    logging.info(f"Gesamtdauer: {time.time() - start:.2f} Sekunden")
+    if args.command == "apply":
+        asyncio.run(run_apply(token, tagId, plan_path, limiter, batch_size, set(state.entity_lookup.values())))
+        state.journal.close()
+        finish_run(start, args)
+        sys.exit(0)
+
+    if len(catalogues) > 1:
+        parse_workers = args.parse_workers or min(len(catalogues), os.cpu_count() or 1)
+        logging.info(f"Mehrfach-Import: {len(catalogues)} Kataloge, {parse_workers} Parse-Prozesse, "
+                     f"bis zu {concurrency} parallele Requests, Batchgröße {batch_size}")
+        asyncio.run(run_catalogues(token, [catalogue[:2] for catalogue in catalogues], limiter, batch_size,
+                                   parse_workers, args.deterministic_ids))
+        state.journal.close()
+        finish_run(start, args)
+        sys.exit(0)
+
+    # Der Abgleich benötigt den vollständigen Stand des Servers. Beim Fortsetzen fehlen im
+    # Journal die Requests, die beim Abbruch unterwegs waren; der Server kennt sie bereits
+    sync_state = CatalogState() if args.sync else None
+    if args.prefetch or args.sync or args.resume:
+        prefetch_or_exit(token, tagId, args.prefetch_page_size, sync_state)
+        if args.resume:
+            # Auch nicht im Journal bestätigte Entries mit dem Dictionary verknüpfen
+            resumed_ids = list(dict.fromkeys([*resumed_ids, *state.prefetched_ids]))
+
+    if args.pipeline:
+        logging.info(f"Pipeline-Modus: bis zu {concurrency} parallele Requests, Batchgröße {batch_size}")
+        asyncio.run(run_pipelined_import(token, tagId, file_path, limiter, batch_size, args.queue_size, resumed_ids, profile_options))
+        state.journal.close()
+        finish_run(start, args)
+        sys.exit(0)
+
+    dictAttrs, tasks, relationship_tasks, sync_plan = prepare_batch_import(file_path, sync_state, args.parse_cache,
+                                                                            profile_options)
+    if sync_plan is not None:
+        # Dictionary-Beziehungen auch für vorhandene Entries (falls das Dictionary neu ist)
+        resumed_ids = [*resumed_ids, *sync_plan.existing_ids]
+
+    logging.info(f"Verwende bis zu {concurrency} parallele Requests, Batchgröße {batch_size}")
+
+    asyncio.run(run_import(token, tagId, dictAttrs, tasks, relationship_tasks, limiter, batch_size, resumed_ids))
+    state.journal.close()
+    finish_run(start, args)